@@ -0,0 +1,95 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+DATA_VERSION_KEY = "data_version"
+
+
+def is_shared() -> bool:
+    """Whether the default cache is shared by all processes
+    A version bumped by a worker never reaches the web processes through a
+    per-process cache, responses are not cached then.
+    """
+    return not isinstance(caches["default"], (LocMemCache, DummyCache))
+
+
+def check_cache(app_configs=None, **kwargs) -> list[checks.CheckMessage]:
+    """System check warning of a per-process cache, see `is_shared`"""
+    if settings.DEBUG or is_shared():
+        return []
+    return [
+        checks.Warning(
+            "The default cache is not shared by all processes, API responses "
+            "are not cached.",
+            hint="Set CACHE_BACKEND to a shared backend, ie. "
+            "django.core.cache.backends.db.DatabaseCache.",
+            id="base.W001",
+        )
+    ]
+
+
+def get_data_version() -> int:
+    """Returns the current version of the data the read endpoints serve"""
+    # seeded from the clock, so a lost counter never revives stale entries
+    return cache.get_or_set(DATA_VERSION_KEY, time.time_ns, timeout=None)
+
+
+def bump_data_version() -> None:
+    """Retires every cached response at once, with no keys to scan"""
+    try:
+        cache.incr(DATA_VERSION_KEY)
+    except ValueError:  # missing, evicted or expired
+        get_data_version()
+
+
+class CachedResponseMixin:
+    """Serves the list and detail reads of a viewset from the cache
+    Responses are keyed on the full path, query string included, and the
+    data version, so bumping it retires all of them at once, see
+    `bump_data_version`. Writes through the viewset bump it as well.
+    Authentication and permissions are checked on every request all the
+    same, the data served is the same for all users. Nothing is cached
+    unless the cache is shared by all processes, see `is_shared`.
+    """
+
+    def get_cache_key(self, request: Request) -> str:
+        path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+        return f"response:{get_data_version()}:{path}"
+
+    def cached(self, request: Request, read, *args, **kwargs) -> Response:
+        if not is_shared():
+            return read(request, *args, **kwargs)
+        key = self.get_cache_key(request)
+        data = cache.get(key)
+        if data is None:
+            response = read(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            data = response.data
+            cache.set(key, data, settings.API_CACHE_TTL)
+        return Response(data)
+
+    def list(self, request: Request, *args, **kwargs) -> Response:
+        return self.cached(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request: Request, *args, **kwargs) -> Response:
+        return self.cached(request, super().retrieve, *args, **kwargs)
+
+    def perform_create(self, serializer) -> None:
+        super().perform_create(serializer)
+        bump_data_version()
+
+    def perform_update(self, serializer) -> None:
+        super().perform_update(serializer)
+        bump_data_version()
+
+    def perform_destroy(self, instance) -> None:
+        super().perform_destroy(instance)
+        bump_data_version()
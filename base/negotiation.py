@@ -0,0 +1,18 @@
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.renderers import BaseRenderer
+from rest_framework.request import Request
+
+
+class FirstRendererNegotiation(DefaultContentNegotiation):
+    """Skips matching the Accept header, for views that render themselves
+    Their own responses bypass the renderers. The first renderer is left
+    to the errors, instead of a 406 for clients accepting ie. text/csv.
+    """
+
+    def select_renderer(
+        self,
+        request: Request,
+        renderers: list[BaseRenderer],
+        format_suffix: str = None,
+    ) -> tuple[BaseRenderer, str]:
+        return renderers[0], renderers[0].media_type
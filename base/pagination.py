@@ -0,0 +1,71 @@
+import json
+
+from django.db import connections
+from django.db.models import QuerySet
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from rest_framework.response import Response
+
+
+def estimate_count(queryset: QuerySet) -> int:
+    """Returns the number of rows the planner expects the queryset to have
+    Read from the statistics of the query plan on PostgreSQL, without
+    scanning the rows. Other databases keep no such statistics, the rows
+    are counted there.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != "postgresql":
+        return queryset.count()
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):  # not decoded by the driver
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+class OffsetFallbackPagination(PageNumberPagination):
+    """Page numbers, for the orderings a cursor cannot be keyed on"""
+
+    page_size = 100
+    page_size_query_param = "page_size"
+    max_page_size = 1000
+
+
+class KeysetPagination(CursorPagination):
+    """Cursor pagination keyed on the indexed primary key, newest first
+    Pages are fetched by seeking past the last row of the previous one, so
+    deep pages cost the same as the first. No total is counted, unless
+    asked for with ?count=estimate, see `estimate_count`.
+    Orderings on other fields, which may be null or shared by several rows,
+    cannot key the cursor. They are paginated by page number instead, with
+    the primary key breaking ties, see `OffsetFallbackPagination`.
+    """
+
+    ordering = "-id"
+    page_size = 100
+    page_size_query_param = "page_size"
+    max_page_size = 1000
+    count_query_param = "count"
+    keys = ("id", "pk")  # unique and non-null, able to key the cursor
+    fallback_class = OffsetFallbackPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.fallback = None
+        ordering = self.get_ordering(request, queryset, view)
+        if ordering[0].lstrip("-") not in self.keys:
+            self.fallback = self.fallback_class()
+            queryset = queryset.order_by(*ordering, "-pk")
+            return self.fallback.paginate_queryset(queryset, request, view)
+        self.estimated_count = None
+        if request.query_params.get(self.count_query_param) == "estimate":
+            self.estimated_count = estimate_count(queryset)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data) -> Response:
+        if self.fallback:
+            return self.fallback.get_paginated_response(data)
+        response = super().get_paginated_response(data)
+        if self.estimated_count is not None:
+            response.data["estimated_count"] = self.estimated_count
+        return response
@@ -146,6 +146,22 @@ DATABASES = {
 }
 
 
+# Cache --------------------------------------------------------------------- #
+# https://docs.djangoproject.com/en/3.2/ref/settings/#caches
+
+CACHES = {
+    "default": {
+        "BACKEND": config(
+            "CACHE_BACKEND",
+            default="django.core.cache.backends.locmem.LocMemCache",
+        ),
+        "LOCATION": config("CACHE_LOCATION", default=""),
+    }
+}
+# seconds a read endpoint response is cached at most, see `base.cache`
+API_CACHE_TTL = config("API_CACHE_TTL", default=60 * 60, cast=int)
+
+
 # Password validation ------------------------------------------------------- #
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
@@ -272,3 +288,135 @@ CELERY_CACHE_BACKEND = config("CELERY_CACHE_BACKEND", default="django-cache")
 CELERY_TIMEZONE = config("CELERY_TIME_ZONE", default=TIME_ZONE)
 CELERY_TASK_TRACK_STARTED = config("CELERY_TASK_TRACK_STARTED", default=True)
 CELERY_TASK_TIME_LIMIT = config("CELERY_TASK_TIME_LIMIT", default=30 * 60)
+
+
+# Proxy checks ----------------------------------------------------------------
+
+# max number of in-flight probes of the asyncio verification engine
+PROXY_CHECK_CONCURRENCY = config(
+    "PROXY_CHECK_CONCURRENCY", default=500, cast=int
+)
+
+# check results are written back in batches of this size ...
+PROXY_CHECK_FLUSH_SIZE = config(
+    "PROXY_CHECK_FLUSH_SIZE", default=500, cast=int
+)
+# ... or at least this often, in seconds
+PROXY_CHECK_FLUSH_INTERVAL = config(
+    "PROXY_CHECK_FLUSH_INTERVAL", default=10, cast=float
+)
+
+# seconds between checks of a working proxy, doubled after every passed check
+PROXY_RECHECK_MIN_INTERVAL = config(
+    "PROXY_RECHECK_MIN_INTERVAL", default=15 * 60, cast=int
+)
+# ... up to this ceiling, in seconds
+PROXY_RECHECK_MAX_INTERVAL = config(
+    "PROXY_RECHECK_MAX_INTERVAL", default=24 * 60 * 60, cast=int
+)
+
+# consecutive failed checks before a proxy is marked dead ...
+PROXY_DEAD_AFTER = config("PROXY_DEAD_AFTER", default=3, cast=int)
+# ... and before it is deleted altogether
+PROXY_PURGE_AFTER = config("PROXY_PURGE_AFTER", default=6, cast=int)
+
+# proxies per shard when a check is fanned out over the celery workers
+PROXY_CHECK_SHARD_SIZE = config(
+    "PROXY_CHECK_SHARD_SIZE", default=2000, cast=int
+)
+# seconds a check run (or shard task) may take before it pauses itself, to
+# be resumed by the next run; kept below the celery task time limit
+PROXY_CHECK_TIME_BUDGET = config(
+    "PROXY_CHECK_TIME_BUDGET",
+    default=int(CELERY_TASK_TIME_LIMIT) * 0.8,
+    cast=float,
+)
+
+# proxies must accept a TCP connection within this many seconds ...
+PROXY_PREFILTER_TIMEOUT = config(
+    "PROXY_PREFILTER_TIMEOUT", default=3, cast=float
+)
+# ... with this many connection attempts in flight
+PROXY_PREFILTER_CONCURRENCY = config(
+    "PROXY_PREFILTER_CONCURRENCY", default=2000, cast=int
+)
+# newly scraped proxies get their listed protocol checked by the prefilter
+PROXY_DETECT_PROTOCOL = config(
+    "PROXY_DETECT_PROTOCOL", default=True, cast=bool
+)
+# probe timeouts are this multiple of a proxy's p95 connect time and time to
+# first byte, doubled for every failed check in a row ...
+PROXY_TIMEOUT_FACTOR = config("PROXY_TIMEOUT_FACTOR", default=3, cast=float)
+# ... within these bounds, in seconds; proxies without history get the max
+PROXY_CONNECT_TIMEOUT_MIN = config(
+    "PROXY_CONNECT_TIMEOUT_MIN", default=1, cast=float
+)
+PROXY_CONNECT_TIMEOUT_MAX = config(
+    "PROXY_CONNECT_TIMEOUT_MAX", default=5, cast=float
+)
+PROXY_READ_TIMEOUT_MIN = config(
+    "PROXY_READ_TIMEOUT_MIN", default=5, cast=float
+)
+PROXY_READ_TIMEOUT_MAX = config(
+    "PROXY_READ_TIMEOUT_MAX", default=30, cast=float
+)
+# seconds a SOCKS proxy has to answer the greeting, before it is taken for
+# a proxy of another protocol
+PROXY_HANDSHAKE_TIMEOUT = config(
+    "PROXY_HANDSHAKE_TIMEOUT", default=5, cast=float
+)
+
+# judge view (scraper:judge) to verify proxies and classify their anonymity
+# with, ie. https://tda.example.com/api/judge/; test URLs are used if empty
+PROXY_JUDGE_URL = config("PROXY_JUDGE_URL", default="")
+# public ip of the checker, discovered through the judge if empty
+PROXY_REAL_IP = config("PROXY_REAL_IP", default="")
+
+# test targets drawn for every probe from the health-scored pool of TEST_URLS
+PROXY_TEST_URLS_PER_PROBE = config(
+    "PROXY_TEST_URLS_PER_PROBE", default=3, cast=int
+)
+# targets failing more often than this through working proxies are benched
+PROXY_TARGET_MAX_ERROR_RATE = config(
+    "PROXY_TARGET_MAX_ERROR_RATE", default=0.5, cast=float
+)
+# ... once they have this many results ...
+PROXY_TARGET_MIN_SAMPLES = config(
+    "PROXY_TARGET_MIN_SAMPLES", default=10, cast=int
+)
+# ... for this many seconds
+PROXY_TARGET_COOLDOWN = config(
+    "PROXY_TARGET_COOLDOWN", default=10 * 60, cast=float
+)
+
+# warm pool GetProxyAPI serves from: at most this many proxies ...
+PROXY_POOL_SIZE = config("PROXY_POOL_SIZE", default=500, cast=int)
+# ... that passed their last check, overdue by at most this many seconds ...
+PROXY_POOL_MAX_AGE = config("PROXY_POOL_MAX_AGE", default=60 * 60, cast=int)
+# ... rebuilt by the checker, or when requested this long after the last
+PROXY_POOL_TTL = config("PROXY_POOL_TTL", default=5 * 60, cast=int)
+# most proxies a single batch request to GetProxyAPI can get, ie. ?count=100
+PROXY_BATCH_MAX = config("PROXY_BATCH_MAX", default=500, cast=int)
+# seconds a leased proxy stays exclusive to its client by default ...
+PROXY_LEASE_TTL = config("PROXY_LEASE_TTL", default=5 * 60, cast=int)
+# ... and at most, per lease or renewal
+PROXY_LEASE_MAX_TTL = config("PROXY_LEASE_MAX_TTL", default=60 * 60, cast=int)
+
+# random proxies get_random_working_proxy draws from the db at a time ...
+PROXY_SAMPLE_SIZE = config("PROXY_SAMPLE_SIZE", default=20, cast=int)
+# ... and how many such samples it tries before giving up
+PROXY_SAMPLE_ATTEMPTS = config("PROXY_SAMPLE_ATTEMPTS", default=5, cast=int)
+
+# candidates get_random_working_proxy tests at once
+PROXY_TEST_PARALLEL = config("PROXY_TEST_PARALLEL", default=4, cast=int)
+# ... and all requests together, on the threads they share
+PROXY_TEST_WORKERS = config("PROXY_TEST_WORKERS", default=32, cast=int)
+# seconds a proxy is known to work for the targets it was tested against ...
+PROXY_VERDICT_TTL = config("PROXY_VERDICT_TTL", default=10 * 60, cast=int)
+# ... or known not to
+PROXY_VERDICT_FAILED_TTL = config(
+    "PROXY_VERDICT_FAILED_TTL", default=30 * 60, cast=int
+)
+
+# latency samples kept per proxy for its rolling p50/p95 summary
+PROXY_LATENCY_SAMPLES = config("PROXY_LATENCY_SAMPLES", default=20, cast=int)
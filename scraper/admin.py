@@ -1,8 +1,25 @@
 from django.contrib import admin
 
+from base.cache import bump_data_version
 from scraper import models
 
 
+class DataVersionAdmin(admin.ModelAdmin):
+    """Retires the cached API responses whenever data is edited"""
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        bump_data_version()  # after the object and its inlines are saved
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        bump_data_version()
+
+    def delete_queryset(self, request, queryset):
+        super().delete_queryset(request, queryset)
+        bump_data_version()
+
+
 class PageInline(admin.StackedInline):
     model = models.Page
     readonly_fields = ("created_at", "updated_at")
@@ -11,7 +28,7 @@ class PageInline(admin.StackedInline):
 
 
 @admin.register(models.Website)
-class WebsiteAdmin(admin.ModelAdmin):
+class WebsiteAdmin(DataVersionAdmin):
     model = models.Website
     date_hierarchy = "created_at"
     readonly_fields = ("created_at", "updated_at")
@@ -34,7 +51,7 @@ class WebsiteAdmin(admin.ModelAdmin):
 
 
 @admin.register(models.Proxy)
-class ProxyAdmin(admin.ModelAdmin):
+class ProxyAdmin(DataVersionAdmin):
     model = models.Proxy
     date_hierarchy = "created_at"
     readonly_fields = (
@@ -42,6 +59,19 @@ class ProxyAdmin(admin.ModelAdmin):
         "updated_at",
         "checked_at",
         "checked_count",
+        "failed_count",
+        "fail_streak",
+        "score",
+        "next_check_at",
+        "connect_ms",
+        "connect_p95",
+        "latency_ms",
+        "latency_p50",
+        "latency_p95",
+        "latency_samples",
+        "lease_token",
+        "leased_at",
+        "leased_until",
     )
     list_display = (
         "__str__",
@@ -51,6 +81,9 @@ class ProxyAdmin(admin.ModelAdmin):
         "created_at",
         "checked_at",
         "updated_at",
+        "latency_p50",
+        "score",
+        "fail_streak",
         "is_dead",
         "is_active",
     )
@@ -90,6 +123,8 @@ class CheckAdmin(admin.ModelAdmin):
         "created_at",
         "updated_at",
         "completed_at",
+        "stats",
+        "cursor",
     )
     list_display = (
         "__str__",
@@ -1,6 +1,12 @@
 from django.apps import AppConfig
+from django.core import checks
 
 
 class ScraperConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "scraper"
+
+    def ready(self) -> None:
+        from base.cache import check_cache
+
+        checks.register(check_cache, checks.Tags.caches)
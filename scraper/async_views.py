@@ -0,0 +1,177 @@
+"""
+Async counterparts of the proxy-serving API views, for the ASGI app.
+
+Live tests are run on the asyncio `scraper.probe` engine, so a request
+waiting on the network holds no thread and a single process can serve
+thousands of them at once. Django has no async ORM or cache API yet, the
+short database and cache calls are run through `sync_to_async`.
+"""
+import asyncio
+import functools
+import typing
+from http import HTTPStatus
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpRequest, JsonResponse
+from rest_framework.exceptions import MethodNotAllowed
+from rest_framework.request import Request
+from rest_framework.views import APIView
+
+from scraper import leases, pool, verdicts
+from scraper.models import Proxy
+from scraper.probe import probe
+from scraper.utils import (
+    get_candidates,
+    get_known_working,
+    get_sample,
+    get_timeouts,
+)
+from scraper.views import (
+    GetProxyAPI,
+    LeaseProxyAPI,
+    get_count,
+    get_filters,
+    get_test_urls,
+    get_ttl,
+)
+
+NO_PROXY_FOUND = {"status": "NO PROXY FOUND"}
+
+
+def api_view(api: type[APIView]) -> typing.Callable:
+    """Runs an async view under the policies of its sync counterpart
+    Content negotiation, authentication, permissions and throttles of the
+    `api` view are run through `sync_to_async`, as they may query the db or
+    the cache, and only the methods it handles are allowed. The view is
+    handed the request as a DRF <Request>, and exceptions it raises are
+    answered like DRF does, with the WWW-Authenticate header of a 401.
+    Args:
+        api: <APIView> class the view is the async counterpart of
+    """
+
+    def decorator(view: typing.Callable) -> typing.Callable:
+        @functools.wraps(view)
+        async def wrapper(request: HttpRequest, *args, **kwargs):
+            policies = api(args=args, kwargs=kwargs)
+            policies.headers = policies.default_response_headers
+            request = policies.initialize_request(request, *args, **kwargs)
+            policies.request = request
+            try:
+                method = request.method.lower()
+                if method not in policies.http_method_names or not hasattr(
+                    policies, method
+                ):
+                    raise MethodNotAllowed(request.method)
+                await sync_to_async(policies.initial)(request, *args, **kwargs)
+                return await view(request, *args, **kwargs)
+            except Exception as exc:
+                response = policies.handle_exception(exc)
+                return policies.finalize_response(
+                    request, response, *args, **kwargs
+                ).render()
+
+        # csrf is enforced by SessionAuthentication, as for the DRF views
+        wrapper.csrf_exempt = True
+        return wrapper
+
+    return decorator
+
+
+def respond(result: typing.Optional[dict]) -> JsonResponse:
+    if not result:
+        return JsonResponse(NO_PROXY_FOUND, status=HTTPStatus.NO_CONTENT)
+    return JsonResponse(
+        {"result": result, "status": "SUCCESS"}, status=HTTPStatus.OK
+    )
+
+
+async def get_first_working(
+    proxies: list[Proxy], test_urls: list or tuple, target: str
+) -> typing.Optional[Proxy]:
+    """Probes the proxies PROXY_TEST_PARALLEL at a time, in the given order
+    Returns as soon as one works, cancelling the probes still in flight;
+    unlike `scraper.utils.get_first_working`, where they finish in the
+    background, their verdicts are not cached. Verdicts of the probes that
+    did finish are, even when cancelled while recording them.
+    """
+    semaphore = asyncio.Semaphore(settings.PROXY_TEST_PARALLEL)
+
+    async def test(proxy: Proxy) -> tuple[bool, Proxy]:
+        async with semaphore:
+            status, _ = await probe(
+                {k: getattr(proxy, k) for k in GetProxyAPI.fields},
+                test_urls,
+                get_timeouts(proxy),
+            )
+        await asyncio.shield(
+            sync_to_async(verdicts.record)(target, proxy.pk, status)
+        )
+        return status, proxy
+
+    tasks = [asyncio.ensure_future(test(proxy)) for proxy in proxies]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            status, proxy = await next_done
+            if status:
+                return proxy
+        return None
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def get_random_working_proxy(
+    test_urls: list or tuple, **kwargs: dict
+) -> typing.Optional[Proxy]:
+    """Async counterpart of `scraper.utils.get_random_working_proxy`"""
+    candidates = get_candidates(**kwargs)
+    target = verdicts.get_target(test_urls)
+    proxy = await sync_to_async(get_known_working)(candidates, target)
+    tried = set()
+    for _ in range(settings.PROXY_SAMPLE_ATTEMPTS):
+        if proxy:
+            break
+        proxies = await sync_to_async(get_sample)(candidates, tried, target)
+        if proxies is None:
+            break
+        proxy = await get_first_working(proxies, test_urls, target)
+    return proxy
+
+
+@api_view(GetProxyAPI)
+async def get_proxy(request: Request) -> JsonResponse:
+    """Async `GetProxyAPI`, for GET single and batch and POST requests"""
+    if request.method == "POST":
+        test_urls = get_test_urls(request.POST)
+        proxy = await get_random_working_proxy(test_urls)
+        return respond(
+            proxy and {k: getattr(proxy, k) for k in GetProxyAPI.fields}
+        )
+
+    filters = get_filters(request.query_params)
+    if "count" not in request.query_params:
+        result = await sync_to_async(pool.pick)(**filters)
+        return respond(result and {k: result[k] for k in GetProxyAPI.fields})
+    count = get_count(request.query_params)
+    results = [
+        {k: p[k] for k in GetProxyAPI.batch_fields}
+        for p in await sync_to_async(pool.pick_many)(count, **filters)
+    ]
+    if not results:
+        return respond(None)
+    return JsonResponse(
+        {"results": results, "count": len(results), "status": "SUCCESS"},
+        status=HTTPStatus.OK,
+    )
+
+
+@api_view(LeaseProxyAPI)
+async def lease(request: Request) -> JsonResponse:
+    """Async `LeaseProxyAPI`"""
+    result = await sync_to_async(leases.lease)(
+        get_ttl(request.data), **get_filters(request.data)
+    )
+    if result:
+        del result["id"]
+    return respond(result)
@@ -1,50 +1,401 @@
+import math
+import time
+import typing
+from collections import defaultdict
+from datetime import timedelta
 from logging import getLogger
 
-import concurrent.futures
-from concurrent.futures import ThreadPoolExecutor
-
+from django.conf import settings
+from django.db.models import F, QuerySet
 from django.utils import timezone
 
+from base.cache import bump_data_version
+from scraper import pool, scoring
 from scraper.models import Proxy, Check
-from scraper.utils import get_proxies, test_ip_port
+from scraper.probe import probe_proxies
+from scraper.utils import get_due_proxies, get_proxies
 
 logger = getLogger(__name__)
 
+LATENCY_FIELDS = (
+    "connect_ms",
+    "connect_p95",
+    "latency_ms",
+    "latency_p50",
+    "latency_p95",
+    "latency_samples",
+)
+
 
-def check(**kwargs: dict) -> None:
-    """Updates or deletes proxies once checked
+def recheck_interval(checked_count: int) -> timedelta:
+    """Time until the next check, doubling with every check passed so far
+    Passing proxies are rechecked by their total passes, failures between
+    them aside, failing ones by their failures in a row.
     Args:
-        kwargs [dict]: keyword arguments passed to <Proxy> filter
+        checked_count: checks passed in total, or failed in a row, before
+    Returns:
+        timedelta: between PROXY_RECHECK_MIN_INTERVAL and _MAX_INTERVAL
     """
-    logger.info("Commencing all available proxy check...")
-    proxies = get_proxies(**kwargs)
-
-    obj = Check.objects.create()
-    if proxies:
-        obj.proxies.add(*proxies)
-
-    with ThreadPoolExecutor() as executor:
-        futures = []
-        proxies = proxies.values("ip", "port", "protocol")
-        for proxy in proxies:
-            futures.append(executor.submit(test_ip_port, **proxy))
-        for future in concurrent.futures.as_completed(futures):
-            try:
-                status, proxy = future.result()
-                qs = Proxy.objects.filter(
-                    ip=proxy.get("ip"), port=proxy.get("port")
+    seconds = settings.PROXY_RECHECK_MIN_INTERVAL * 2 ** min(checked_count, 16)
+    return timedelta(seconds=min(seconds, settings.PROXY_RECHECK_MAX_INTERVAL))
+
+
+def percentile(values: list[int], pct: float) -> typing.Optional[int]:
+    """Nearest-rank percentile of values, None if there are none"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(math.ceil(pct / 100 * len(ordered)) - 1, 0)]
+
+
+def summarize_latency(samples: list, connect_ms: int, ttfb_ms: int) -> dict:
+    """Adds a probe's timings to the rolling latency summary of a proxy
+    Args:
+        samples: previous [connect_ms, ttfb_ms] pairs, oldest first
+        connect_ms: time it took to connect to the proxy
+        ttfb_ms: time to first byte of the response through the proxy
+    Returns:
+        dict: <Proxy> latency field values
+    """
+    keep = settings.PROXY_LATENCY_SAMPLES
+    samples = [*(samples or []), [connect_ms, ttfb_ms]][-keep:]
+    connects, ttfbs = [s[0] for s in samples], [s[1] for s in samples]
+    return {
+        "connect_ms": connect_ms,
+        "connect_p95": percentile(connects, 95),
+        "latency_ms": ttfb_ms,
+        "latency_p50": percentile(ttfbs, 50),
+        "latency_p95": percentile(ttfbs, 95),
+        "latency_samples": samples,
+    }
+
+
+class ResultBuffer:
+    """Collects check results and writes them back to the database in bulk
+    Args:
+        size: flush once this many results are buffered
+        interval: flush once this many seconds passed since the last flush
+    """
+
+    def __init__(self, size: int = None, interval: float = None):
+        self.size = size or settings.PROXY_CHECK_FLUSH_SIZE
+        self.interval = interval or settings.PROXY_CHECK_FLUSH_INTERVAL
+        self.passed: list[tuple] = []  # (id, checked_count, anonymity)
+        self.failed: list[tuple] = []  # (id, fail_streak) of failed
+        self.timed: list[Proxy] = []  # latency and score updates
+        self.scored: list[Proxy] = []  # score updates of the others
+        self.flushed_at = time.monotonic()
+        self.stats = {"passed": 0, "failed": 0}  # totals across flushes
+
+    def __len__(self):
+        return len(self.passed) + len(self.failed)
+
+    def add(self, status: bool, proxy: dict) -> None:
+        """Buffers the result of a single proxy check, and rescores it"""
+        self.stats["passed" if status else "failed"] += 1
+        passed = proxy.get("checked_count", 0)
+        failed = proxy.get("failed_count", 0)
+        fail_streak = proxy.get("fail_streak", 0)
+        latency = {}
+        if status:
+            self.passed.append(
+                (
+                    proxy["id"],
+                    passed,
+                    proxy.get("anonymity"),  # set by the judge, if any
+                )
+            )
+            passed, fail_streak = passed + 1, 0
+            if "ttfb_ms" in proxy:
+                latency = summarize_latency(
+                    proxy.get("latency_samples"),
+                    proxy["connect_ms"],
+                    proxy["ttfb_ms"],
+                )
+        else:
+            self.failed.append((proxy["id"], fail_streak))
+            failed, fail_streak = failed + 1, fail_streak + 1
+
+        points = scoring.score(
+            passed,
+            failed,
+            latency.get("latency_p50", proxy.get("latency_p50")),
+            latency.get("latency_p95", proxy.get("latency_p95")),
+            proxy.get("anonymity"),
+            proxy.get("created_at"),
+            fail_streak,
+        )
+        updates = self.timed if latency else self.scored
+        updates.append(Proxy(pk=proxy["id"], score=points, **latency))
+        elapsed = time.monotonic() - self.flushed_at
+        if len(self) >= self.size or elapsed >= self.interval:
+            self.flush()
+
+    def flush(self) -> None:
+        """Writes the buffered results back, a batch at a time
+        Working proxies are revived, rescheduled with backoff and given the
+        anonymity the judge classified them with, if any. Failed proxies
+        are demoted along their failure streak: suspect first, dead after
+        PROXY_DEAD_AFTER and deleted after PROXY_PURGE_AFTER failures.
+        Latency summaries and scores are updated in bulk. Issues one query
+        per distinct backoff interval and anonymity, or failure streak, one
+        or two bulk updates and one to refresh the warm `pool`.
+        """
+        try:
+            now = timezone.now()
+            schedule = defaultdict(list)
+            for pk, checked_count, anonymity in self.passed:
+                key = recheck_interval(checked_count), anonymity
+                schedule[key].append(pk)
+            for (interval, anonymity), pks in schedule.items():
+                logger.info(f"Updating {len(pks)} proxies, next in {interval}")
+                fields = {"anonymity": anonymity} if anonymity else {}
+                Proxy.objects.filter(pk__in=pks).update(
+                    checked_at=now,
+                    checked_count=F("checked_count") + 1,
+                    fail_streak=0,
+                    is_dead=False,
+                    next_check_at=now + interval,
+                    **fields,
+                )
+            if self.timed:
+                Proxy.objects.bulk_update(
+                    self.timed, (*LATENCY_FIELDS, "score")
                 )
-                if status:
-                    logger.info(f"Updating: {qs}")
-                    qs.update(checked_at=timezone.now())
+            if self.scored:
+                Proxy.objects.bulk_update(self.scored, ("score",))
+
+            streaks, purged = defaultdict(list), []
+            for pk, fail_streak in self.failed:
+                if fail_streak + 1 >= settings.PROXY_PURGE_AFTER:
+                    purged.append(pk)
                 else:
-                    logger.info(f"Deleting: {qs}")
-                    qs.delete()
-            except Exception as e:
-                logger.error(e)
+                    streaks[fail_streak + 1].append(pk)
+            for fail_streak, pks in streaks.items():
+                is_dead = fail_streak >= settings.PROXY_DEAD_AFTER
+                logger.info(
+                    f"Demoting {len(pks)} proxies to "
+                    f"{'dead' if is_dead else 'suspect'}, streak {fail_streak}"
+                )
+                Proxy.objects.filter(pk__in=pks).update(
+                    failed_count=F("failed_count") + 1,
+                    fail_streak=fail_streak,
+                    is_dead=is_dead,
+                    next_check_at=now + recheck_interval(fail_streak - 1),
+                )
+            if purged:
+                logger.info(f"Deleting {len(purged)} proxies")
+                Proxy.objects.filter(pk__in=purged).delete()
+            if self.passed or self.failed:
+                pool.refresh()  # serve the latest results right away
+        except Exception as e:
+            logger.error(e)
+        self.passed, self.failed, self.timed, self.scored = [], [], [], []
+        self.flushed_at = time.monotonic()
+
+
+def get_check_proxies(due: bool = True, **kwargs: dict) -> QuerySet[Proxy]:
+    """Returns the proxies a check should probe
+    Args:
+        due [bool]: only proxies whose next check is due
+        kwargs [dict]: keyword arguments passed to <Proxy> filter
+    """
+    return get_due_proxies(**kwargs) if due else get_proxies(**kwargs)
+
+
+def get_shards(
+    proxies: QuerySet[Proxy], size: int = None
+) -> list[tuple[int, int]]:
+    """Splits proxies into inclusive id ranges of about `size` proxies
+    Args:
+        proxies: QuerySet[<Proxy>] to split
+        size: proxies per shard; default=PROXY_CHECK_SHARD_SIZE
+    Returns:
+        list: (first id, last id) of every shard
+    """
+    size = size or settings.PROXY_CHECK_SHARD_SIZE
+    ids = list(proxies.order_by("id").values_list("id", flat=True))
+    return [
+        (ids[i], ids[min(i + size, len(ids)) - 1])
+        for i in range(0, len(ids), size)
+    ]
+
+
+def get_deadline(budget: float = None) -> float:
+    """`time.monotonic()` by which a run must stop starting new probes
+    The probes still in flight get their longest timeouts to finish, and
+    some time to be written back, before the `budget` runs out.
+    Args:
+        budget: seconds the run may take; default=PROXY_CHECK_TIME_BUDGET
+    """
+    budget = budget or settings.PROXY_CHECK_TIME_BUDGET
+    longest = (
+        settings.PROXY_CONNECT_TIMEOUT_MAX + settings.PROXY_READ_TIMEOUT_MAX
+    )
+    drain = longest + 10  # and the final write back
+    return time.monotonic() + max(budget - drain, 0)
+
+
+def get_resumable() -> typing.Optional[Check]:
+    """Returns the latest <Check> that was paused before completion"""
+    return (
+        Check.objects.filter(completed_at__isnull=True, cursor__isnull=False)
+        .order_by("-created_at")
+        .first()
+    )
+
+
+def check_proxies(
+    obj: Check, proxies: QuerySet[Proxy], deadline: float = None
+) -> dict:
+    """Probes proxies and writes the results back for a <Check>
+    Args:
+        obj: <Check> object for recording
+        proxies: QuerySet[<Proxy>] to check
+        deadline: `time.monotonic()` after which no new probes are started
+    Returns:
+        dict: `passed`, `failed` and `prefilter` counts, any `error` and
+            `resume_after`; id after which proxies were left unchecked when
+            the deadline passed, None if all were checked
+    """
+    results, stats, done, ids = ResultBuffer(), {}, set(), []
+    try:
+        proxies = proxies.order_by("id")
+        if proxies:
+            obj.proxies.add(*proxies)
+        proxies = proxies.values(
+            "id",
+            "ip",
+            "port",
+            "protocol",
+            "anonymity",
+            "created_at",
+            "checked_count",
+            "failed_count",
+            "fail_streak",
+            "connect_p95",
+            "latency_p50",
+            "latency_p95",
+            "latency_samples",
+        )
+        ids = [p["id"] for p in proxies]
+        for status, proxy in probe_proxies(
+            proxies, stats=stats, deadline=deadline
+        ):
+            results.add(status, proxy)
+            done.add(proxy["id"])
+        error = None
+    except Exception as e:
+        logger.error(f"{obj} {e}")
+        error = str(e)
+    results.flush()
+
+    resume_after = None
+    if deadline is not None and time.monotonic() >= deadline:
+        # probes complete out of order, resume after the last of those in
+        # a row that were finished
+        for i, pk in enumerate(ids):
+            if pk not in done:
+                resume_after = ids[i - 1] if i else pk - 1
+                break
+    return {
+        **stats,
+        **results.stats,
+        "error": error,
+        "resume_after": resume_after,
+    }
+
+
+def check_shard(
+    obj: Check,
+    first: int,
+    last: int,
+    due: bool = True,
+    deadline: float = None,
+    **kwargs: dict,
+) -> dict:
+    """Checks the proxies with ids from `first` to `last` for a <Check>
+    Args:
+        obj: <Check> object for recording
+        first: lowest proxy id of the shard
+        last: highest proxy id of the shard
+        due [bool]: only check proxies whose next check is due
+        deadline [float]: `time.monotonic()` to stop starting new probes at
+        kwargs [dict]: keyword arguments passed to <Proxy> filter
+    Returns:
+        dict: see `check_proxies`
+    """
+    logger.info(f"{obj} Checking proxies {first}-{last}...")
+    proxies = get_check_proxies(due, id__gte=first, id__lte=last, **kwargs)
+    return check_proxies(obj, proxies, deadline)
+
+
+def complete(obj: Check, results: list[dict]) -> Check:
+    """Records the outcome of all shards of a <Check>
+    A check with unfinished shards is paused instead, its `cursor` is set
+    to where the next run resumes, see `get_resumable`.
+    Args:
+        obj: <Check> object for recording
+        results: return values of `check_shard` for every shard
+    Returns:
+        <Check>: the completed or paused object
+    """
+    errors = [r["error"] for r in results if r.get("error")]
+    paused = [
+        r["resume_after"] for r in results if r.get("resume_after") is not None
+    ]
+    stats = defaultdict(int, obj.stats or {})  # from runs resumed
+    stats.pop("prefilter_rate", None)
+    for result in results:
+        for key, value in result.items():
+            if key not in ("error", "resume_after"):
+                stats[key] += value
+
+    # share of proxies the TCP prefilter spared the HTTP verification
+    probed = stats["reachable"] + stats["unreachable"]
+    stats["prefilter_rate"] = round(stats["unreachable"] / (probed or 1), 4)
+
+    obj.stats = dict(stats)
+    obj.error = "\n".join(errors) or None
+    if paused:
+        obj.cursor = min(paused)
+        obj.save()
+        bump_data_version()  # results are written back as the check goes
+        logger.info(f"{obj} Proxy check paused after {obj.cursor}")
+        return obj
 
-    # Check object
     obj.completed_at = timezone.now()
-    obj.is_success = True
+    obj.is_success = not errors
     obj.save()
-    logger.info("Proxy check completed!")
+    bump_data_version()
+    logger.info(f"{obj} Proxy check completed! {obj.stats}")
+    return obj
+
+
+def check(due: bool = True, budget: float = None, **kwargs: dict) -> Check:
+    """Checks proxies in this process and records the <Check>
+    Runs shard by shard, checkpointing the `cursor` after each, and pauses
+    before `budget` runs out. A paused check is resumed by the next run.
+    Args:
+        due [bool]: only check proxies whose next check is due
+        budget [float]: seconds the run may take; PROXY_CHECK_TIME_BUDGET
+        kwargs [dict]: keyword arguments passed to <Proxy> filter
+    Returns:
+        <Check>: the completed or paused object
+    """
+    deadline = get_deadline(budget)
+    obj = get_resumable() or Check.objects.create()
+    logger.info(f"{obj} Commencing {'due' if due else 'all'} proxy check...")
+    proxies = get_check_proxies(due, id__gt=obj.cursor or 0, **kwargs)
+    results = []
+    for first, last in get_shards(proxies):
+        if time.monotonic() >= deadline:
+            results.append({"resume_after": first - 1})
+            break
+        result = check_shard(obj, first, last, due, deadline, **kwargs)
+        results.append(result)
+        if result.get("resume_after") is not None:
+            break
+        obj.cursor = last  # checkpoint
+        obj.save(update_fields=["cursor", "updated_at"])
+    return complete(obj, results)
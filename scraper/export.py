@@ -0,0 +1,108 @@
+"""
+Streamed export of the proxy list as ip:port lines, CSV or JSON lines.
+
+Rows are read through a server-side cursor where the database supports
+it and rendered a chunk at a time, so memory stays constant however long
+the list. The list mostly changes with checks and scrapes, its ETag is
+derived from when the latest of them completed, see `get_etag`.
+"""
+import csv
+import hashlib
+import json
+import typing
+
+from django.db.models import Max, QuerySet
+
+from base.cache import get_data_version
+from scraper.models import Check, Proxy, Scrape
+from scraper.utils import get_proxies
+
+EXPORT_FIELDS = (
+    "ip",
+    "port",
+    "protocol",
+    "country",
+    "anonymity",
+    "latency_p95",
+    "score",
+    "checked_at",
+)
+CHUNK_SIZE = 2000  # rows fetched from the cursor and sent at a time
+
+
+def get_export_proxies(
+    max_latency: int = None, **kwargs: dict
+) -> QuerySet[Proxy]:
+    """Returns the live proxies to export, oldest first
+    Args:
+        max_latency: highest p95 latency in ms, unknown latency excluded
+        kwargs: keyword arguments passed to <Proxy> objects filter
+    """
+    if max_latency is not None:
+        kwargs["latency_p95__lte"] = max_latency
+    return get_proxies(is_dead=False, **kwargs).order_by("id")
+
+
+def get_etag(*args: typing.Any) -> str:
+    """ETag of the list, changing with every completed check or scrape
+    And with every proxy added or written through the API, by the highest
+    id and the data version, see `base.cache.bump_data_version`.
+    Args:
+        args: request details the export also depends on, ie. its format
+    """
+    versions = (
+        Check.objects.aggregate(at=Max("completed_at"))["at"],
+        Scrape.objects.aggregate(at=Max("completed_at"))["at"],
+        Proxy.objects.aggregate(id=Max("id"))["id"],
+        get_data_version(),
+        *args,
+    )
+    return '"{}"'.format(hashlib.md5(repr(versions).encode()).hexdigest())
+
+
+class Echo:
+    """File-like object handing back what is written, for `csv.writer`"""
+
+    def write(self, value: str) -> str:
+        return value
+
+
+def render_txt(row: tuple) -> str:
+    return f"{row[0]}:{row[1]}\n"
+
+
+def render_jsonl(row: tuple) -> str:
+    return json.dumps(dict(zip(EXPORT_FIELDS, row)), default=str) + "\n"
+
+
+def render_csv(row: tuple) -> str:
+    return _csv_writer.writerow(row)
+
+
+_csv_writer = csv.writer(Echo())
+
+# renderer of a row, header line and content type of each format
+FORMATS = {
+    "txt": (render_txt, "", "text/plain"),
+    "csv": (render_csv, render_csv(EXPORT_FIELDS), "text/csv"),
+    "jsonl": (render_jsonl, "", "application/x-ndjson"),
+}
+
+
+def export(proxies: QuerySet[Proxy], ext: str) -> typing.Iterator[str]:
+    """Renders the proxies in the format of the file extension
+    Args:
+        proxies: <Proxy> queryset, see `get_export_proxies`
+        ext: one of FORMATS
+    Returns:
+        Iterator[str]: the rendered list, CHUNK_SIZE rows at a time
+    """
+    render, header, _ = FORMATS[ext]
+    rows = proxies.values_list(*EXPORT_FIELDS).iterator(chunk_size=CHUNK_SIZE)
+    chunk = [header]
+    for row in rows:
+        chunk.append(render(row))
+        if len(chunk) >= CHUNK_SIZE:
+            yield "".join(chunk)
+            chunk = []
+    yield "".join(chunk)
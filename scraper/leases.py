@@ -0,0 +1,106 @@
+"""
+Exclusive, time-limited hand-out of verified proxies to crawler workers.
+
+A lease hands a proxy to a single client until it is released or its TTL
+runs out, so concurrent workers never share a proxy. Candidates are locked
+with SELECT ... FOR UPDATE SKIP LOCKED where the database supports it, so
+workers leasing at once pass over each other's rows instead of queueing,
+and claimed with a conditional update, so a lease is never handed out
+twice on databases without row locks either. The least recently leased
+proxy goes first, spreading the load evenly across the pool. Expired
+leases are free to lease again right away, `sweep` merely clears them.
+Leased proxies are kept out of the warm pool, see `scraper.pool`.
+"""
+import typing
+import uuid
+from datetime import datetime, timedelta
+from logging import getLogger
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from scraper import pool
+from scraper.models import Proxy
+
+logger = getLogger(__name__)
+
+LEASE_FIELDS = ("id", "ip", "port", "protocol", "country", "anonymity")
+LEASE_ATTEMPTS = 3  # claims lost to concurrent leases before giving up
+
+
+def get_ttl(ttl: int = None) -> timedelta:
+    """Lease duration, PROXY_LEASE_TTL by default, PROXY_LEASE_MAX_TTL most"""
+    ttl = min(ttl or settings.PROXY_LEASE_TTL, settings.PROXY_LEASE_MAX_TTL)
+    return timedelta(seconds=ttl)
+
+
+def lease(ttl: int = None, **kwargs: dict) -> typing.Optional[dict]:
+    """Leases the least recently leased proxy matching the filters
+    Args:
+        ttl: seconds the lease lasts, see `get_ttl`
+        kwargs: filters, see `scraper.pool.get_leasable`
+    Returns:
+        dict: LEASE_FIELDS of the proxy, its `lease` token and when the
+            lease runs out, None if there is no proxy to lease
+    """
+    for _ in range(LEASE_ATTEMPTS):
+        now = timezone.now()
+        with transaction.atomic():
+            proxy = (
+                pool.get_leasable(now, **kwargs)
+                .select_for_update(skip_locked=True)
+                .order_by(F("leased_at").asc(nulls_first=True), "-score")
+                .values(*LEASE_FIELDS)
+                .first()
+            )
+            if not proxy:
+                return None
+            token, leased_until = uuid.uuid4(), now + get_ttl(ttl)
+            claimed = pool.get_leasable(now, pk=proxy["id"]).update(
+                lease_token=token, leased_at=now, leased_until=leased_until
+            )
+        if claimed:
+            pool.evict(proxy["id"])  # not served to others meanwhile
+            return {**proxy, "lease": token, "leased_until": leased_until}
+        logger.debug(f"<Proxy: {proxy['id']}> Leased concurrently, retrying")
+    return None
+
+
+def renew(token: uuid.UUID, ttl: int = None) -> typing.Optional[datetime]:
+    """Extends an unexpired lease by `ttl` seconds from now
+    Returns:
+        datetime: when the lease runs out, None if there is no such lease
+    """
+    now = timezone.now()
+    leased_until = now + get_ttl(ttl)
+    renewed = Proxy.objects.filter(
+        lease_token=token, leased_until__gt=now
+    ).update(leased_until=leased_until)
+    return leased_until if renewed else None
+
+
+def release(token: uuid.UUID) -> bool:
+    """Ends a lease, making its proxy available to others right away
+    Returns:
+        bool: whether there was such a lease
+    """
+    return bool(
+        Proxy.objects.filter(lease_token=token).update(
+            lease_token=None, leased_until=None
+        )
+    )
+
+
+def sweep() -> int:
+    """Clears the expired leases, a single indexed update
+    Returns:
+        int: number of leases cleared
+    """
+    swept = Proxy.objects.filter(leased_until__lte=timezone.now()).update(
+        lease_token=None, leased_until=None
+    )
+    if swept:
+        logger.info(f"Swept {swept} expired proxy leases")
+    return swept
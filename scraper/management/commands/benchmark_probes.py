@@ -0,0 +1,78 @@
+import time
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.core.management import BaseCommand
+
+from scraper.probe import probe_proxies
+from scraper.utils import test_ip_port
+from utils.stubs import StubProxyServer
+
+
+def test_unpooled(proxy: dict, test_urls: tuple) -> bool:
+    """Tests a proxy the old way, a new connection and pool per request"""
+    params = {"http": f"http://{proxy['ip']}:{proxy['port']}"}
+    try:
+        return all(
+            requests.get(url, timeout=30, proxies=params).ok
+            for url in test_urls
+        )
+    except requests.RequestException:
+        return False
+
+
+class Command(BaseCommand):
+    help = "Compares thread and asyncio probe throughput on a stub proxy"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--proxies", type=int, default=500)
+        parser.add_argument("--delay", type=float, default=0.2)
+        parser.add_argument("--concurrency", type=int, default=500)
+
+    def handle(self, *args, **options):
+        count = options["proxies"]
+        test_urls = ("http://stub.invalid/ip",)  # resolved by the stub only
+
+        with StubProxyServer(delay=options["delay"]) as stub:
+            proxies = [
+                {"ip": stub.ip, "port": stub.port, "protocol": "HTTP"}
+            ] * count
+
+            with self.measure("unpooled", count):
+                with ThreadPoolExecutor() as executor:
+                    list(
+                        executor.map(
+                            lambda p: test_unpooled(p, test_urls), proxies
+                        )
+                    )
+
+            with self.measure("pooled", count):
+                with ThreadPoolExecutor() as executor:
+                    list(
+                        executor.map(
+                            lambda p: test_ip_port(p, test_urls=test_urls),
+                            proxies,
+                        )
+                    )
+
+            with self.measure("asyncio", count):
+                list(
+                    probe_proxies(
+                        proxies,
+                        test_urls=test_urls,
+                        concurrency=options["concurrency"],
+                    )
+                )
+
+    @contextmanager
+    def measure(self, engine: str, count: int):
+        """Reports the wall and CPU time of probing `count` proxies"""
+        start, cpu = time.perf_counter(), time.process_time()
+        yield
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            f"{engine:>8}: {count} probes in {elapsed:.2f}s "
+            f"({count / elapsed:.1f} probes/s, "
+            f"{(time.process_time() - cpu) * 1000 / count:.2f}ms CPU/probe)"
+        )
@@ -4,5 +4,17 @@ from scraper.check import check
 
 
 class Command(BaseCommand):
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Check every proxy instead of the ones that are due",
+        )
+        parser.add_argument(
+            "--budget",
+            type=float,
+            help="Seconds to run before pausing, resumed by the next run",
+        )
+
     def handle(self, *args, **options):
-        check()
+        check(due=not options["all"], budget=options["budget"])
@@ -0,0 +1,26 @@
+# Generated by Django 3.2.25 on 2026-10-17 11:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("scraper", "0004_auto_20210730_1518"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="proxy",
+            name="next_check_at",
+            field=models.DateTimeField(
+                blank=True, null=True, verbose_name="Next check due"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="proxy",
+            index=models.Index(
+                fields=["next_check_at"], name="scraper_pro_next_ch_cb113d_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 3.2.25 on 2026-10-17 11:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("scraper", "0005_auto_20261017_1120"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="proxy",
+            name="fail_streak",
+            field=models.PositiveSmallIntegerField(
+                default=0, verbose_name="Consecutive failed checks"
+            ),
+        ),
+    ]
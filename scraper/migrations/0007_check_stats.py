@@ -0,0 +1,20 @@
+# Generated by Django 3.2.25 on 2026-10-17 11:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("scraper", "0006_proxy_fail_streak"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="check",
+            name="stats",
+            field=models.JSONField(
+                blank=True, default=dict, verbose_name="Statistics"
+            ),
+        ),
+    ]
@@ -0,0 +1,73 @@
+# Generated by Django 3.2.25 on 2026-10-17 11:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("scraper", "0007_check_stats"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="proxy",
+            name="connect_ms",
+            field=models.PositiveIntegerField(
+                blank=True, null=True, verbose_name="Last connect time (ms)"
+            ),
+        ),
+        migrations.AddField(
+            model_name="proxy",
+            name="connect_p95",
+            field=models.PositiveIntegerField(
+                blank=True, null=True, verbose_name="Connect time p95 (ms)"
+            ),
+        ),
+        migrations.AddField(
+            model_name="proxy",
+            name="latency_ms",
+            field=models.PositiveIntegerField(
+                blank=True,
+                null=True,
+                verbose_name="Last time to first byte (ms)",
+            ),
+        ),
+        migrations.AddField(
+            model_name="proxy",
+            name="latency_p50",
+            field=models.PositiveIntegerField(
+                blank=True,
+                null=True,
+                verbose_name="Time to first byte p50 (ms)",
+            ),
+        ),
+        migrations.AddField(
+            model_name="proxy",
+            name="latency_p95",
+            field=models.PositiveIntegerField(
+                blank=True,
+                null=True,
+                verbose_name="Time to first byte p95 (ms)",
+            ),
+        ),
+        migrations.AddField(
+            model_name="proxy",
+            name="latency_samples",
+            field=models.JSONField(
+                blank=True, default=list, verbose_name="Latency samples"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="proxy",
+            index=models.Index(
+                fields=["latency_p50"], name="scraper_pro_latency_b01e99_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="proxy",
+            index=models.Index(
+                fields=["latency_p95"], name="scraper_pro_latency_565ced_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 3.2.25 on 2026-10-17 11:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("scraper", "0008_auto_20261017_1127"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="check",
+            name="cursor",
+            field=models.PositiveBigIntegerField(
+                blank=True, null=True, verbose_name="Checked up to proxy id"
+            ),
+        ),
+    ]
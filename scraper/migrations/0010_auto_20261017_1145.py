@@ -0,0 +1,31 @@
+# Generated by Django 3.2.25 on 2026-10-17 11:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("scraper", "0009_check_cursor"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="proxy",
+            name="failed_count",
+            field=models.PositiveIntegerField(
+                default=0, verbose_name="Failed check count"
+            ),
+        ),
+        migrations.AddField(
+            model_name="proxy",
+            name="score",
+            field=models.FloatField(default=0, verbose_name="Score"),
+        ),
+        migrations.AddIndex(
+            model_name="proxy",
+            index=models.Index(
+                fields=["-score"], name="scraper_pro_score_5b39dd_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 3.2.25 on 2026-10-17 11:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("scraper", "0010_auto_20261017_1145"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="proxy",
+            name="lease_token",
+            field=models.UUIDField(
+                blank=True, null=True, unique=True, verbose_name="Lease token"
+            ),
+        ),
+        migrations.AddField(
+            model_name="proxy",
+            name="leased_at",
+            field=models.DateTimeField(
+                blank=True, null=True, verbose_name="Last leased"
+            ),
+        ),
+        migrations.AddField(
+            model_name="proxy",
+            name="leased_until",
+            field=models.DateTimeField(
+                blank=True, null=True, verbose_name="Leased until"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="proxy",
+            index=models.Index(
+                fields=["leased_until"], name="scraper_pro_leased__0cd210_idx"
+            ),
+        ),
+    ]
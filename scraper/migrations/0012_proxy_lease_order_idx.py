@@ -0,0 +1,46 @@
+# Generated by Django 3.2.25 on 2026-10-17 12:20
+
+from django.db import migrations
+
+INDEX_NAME = "proxy_lease_order_idx"
+
+
+def create_lease_order_index(apps, schema_editor):
+    """Index of the lease order, least recently leased and highest scored
+    first. Never leased proxies go first, PostgreSQL is told to sort nulls
+    first in the index as well, other databases do so anyway. Django 3.2
+    cannot declare such an index on every database, it is created here.
+    """
+    model = apps.get_model("scraper", "Proxy")
+    quote = schema_editor.quote_name
+    nulls = (
+        " NULLS FIRST"
+        if schema_editor.connection.vendor == "postgresql"
+        else ""
+    )
+    schema_editor.execute(
+        f"CREATE INDEX {quote(INDEX_NAME)} ON {quote(model._meta.db_table)} "
+        f"({quote('leased_at')} ASC{nulls}, {quote('score')} DESC)"
+    )
+
+
+def drop_lease_order_index(apps, schema_editor):
+    model = apps.get_model("scraper", "Proxy")
+    schema_editor.execute(
+        schema_editor.sql_delete_index
+        % {
+            "table": schema_editor.quote_name(model._meta.db_table),
+            "name": schema_editor.quote_name(INDEX_NAME),
+        }
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("scraper", "0011_auto_20261017_1151"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_lease_order_index, drop_lease_order_index),
+    ]
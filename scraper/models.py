@@ -131,7 +131,45 @@ class Proxy(TimeStampedModel):
     checked_count = models.PositiveSmallIntegerField(
         _("Checked count"), default=0
     )
+    failed_count = models.PositiveIntegerField(
+        _("Failed check count"), default=0
+    )
     is_dead = models.BooleanField(_("Dead status"), default=False)
+    fail_streak = models.PositiveSmallIntegerField(
+        _("Consecutive failed checks"), default=0
+    )
+    next_check_at = models.DateTimeField(
+        _("Next check due"), blank=True, null=True
+    )
+    connect_ms = models.PositiveIntegerField(
+        _("Last connect time (ms)"), blank=True, null=True
+    )
+    connect_p95 = models.PositiveIntegerField(
+        _("Connect time p95 (ms)"), blank=True, null=True
+    )
+    latency_ms = models.PositiveIntegerField(
+        _("Last time to first byte (ms)"), blank=True, null=True
+    )
+    latency_p50 = models.PositiveIntegerField(
+        _("Time to first byte p50 (ms)"), blank=True, null=True
+    )
+    latency_p95 = models.PositiveIntegerField(
+        _("Time to first byte p95 (ms)"), blank=True, null=True
+    )
+    # most recent [connect_ms, latency_ms] pairs, oldest first
+    latency_samples = models.JSONField(
+        _("Latency samples"), default=list, blank=True
+    )
+    # selection weight, see `scraper.scoring`
+    score = models.FloatField(_("Score"), default=0)
+    # exclusive hand-out to a single client, see `scraper.leases`
+    lease_token = models.UUIDField(
+        _("Lease token"), blank=True, null=True, unique=True
+    )
+    leased_at = models.DateTimeField(_("Last leased"), blank=True, null=True)
+    leased_until = models.DateTimeField(
+        _("Leased until"), blank=True, null=True
+    )
 
     class Meta:
         constraints = [
@@ -143,6 +181,12 @@ class Proxy(TimeStampedModel):
             models.Index(fields=["ip", "port"]),
             models.Index(fields=["-created_at"]),
             models.Index(fields=["-checked_at"]),
+            models.Index(fields=["next_check_at"]),
+            models.Index(fields=["latency_p50"]),
+            models.Index(fields=["latency_p95"]),
+            models.Index(fields=["-score"]),
+            models.Index(fields=["leased_until"]),
+            # and proxy_lease_order_idx, see migration 0012
         )
         verbose_name_plural = "Proxies"
         ordering = ("-id",)
@@ -150,6 +194,11 @@ class Proxy(TimeStampedModel):
     def __str__(self):
         return f"<Proxy: {self.id}> {self.ip}:{self.port}"
 
+    @property
+    def is_suspect(self):
+        """Failed its latest check(s) but is not considered dead yet"""
+        return self.fail_streak > 0 and not self.is_dead
+
 
 class Scrape(TaskLogModel):
     sites = models.ManyToManyField(Website, related_name="sites")
@@ -172,6 +221,11 @@ class Scrape(TaskLogModel):
 
 class Check(TaskLogModel):
     proxies = models.ManyToManyField(Proxy, related_name="proxies")
+    stats = models.JSONField(_("Statistics"), default=dict, blank=True)
+    # proxies with ids up to the cursor are checked, resumed from if paused
+    cursor = models.PositiveBigIntegerField(
+        _("Checked up to proxy id"), blank=True, null=True
+    )
 
     class Meta:
         indexes = (
@@ -0,0 +1,181 @@
+"""
+Warm pool of recently verified proxies, served without live probing.
+
+The checker rebuilds the pool from the database after every write-back, so
+it follows the latest results; a request finding it missing rebuilds it
+with a single query. The pool lives in the default cache, shared by all
+processes when a shared backend is configured.
+"""
+import typing
+from datetime import datetime, timedelta
+from logging import getLogger
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q, QuerySet
+from django.utils import timezone
+
+from scraper.models import Anonymity, Proxy
+from scraper.scoring import weighted_choice, weighted_shuffle
+from scraper.utils import get_proxies
+
+logger = getLogger(__name__)
+
+POOL_KEY = "scraper:pool"
+TRUNCATED_KEY = "scraper:pool:truncated"  # verified proxies left out
+POOL_FIELDS = (
+    "id",
+    "ip",
+    "port",
+    "protocol",
+    "country",
+    "anonymity",
+    "latency_p95",
+    "score",
+    "leased_until",
+)
+
+
+def get_verified_proxies(**kwargs: dict) -> QuerySet[Proxy]:
+    """Returns the working proxies whose last check is still current
+    Anonymous and elite proxies without failures since, whose recheck is
+    overdue by at most PROXY_POOL_MAX_AGE seconds. Reliable proxies are
+    rechecked less often, their last check stays current for longer, see
+    `scraper.check.recheck_interval`.
+    Args:
+        kwargs: keyword arguments passed to <Proxy> objects filter
+    """
+    since = timezone.now() - timedelta(seconds=settings.PROXY_POOL_MAX_AGE)
+    return get_proxies(
+        anonymity__in=[Anonymity.ANONYMOUS[0], Anonymity.ELITE[0]],
+        is_dead=False,
+        fail_streak=0,
+        next_check_at__gte=since,
+    ).filter(**kwargs)
+
+
+def get_leasable(
+    now: datetime, max_latency: int = None, **kwargs: dict
+) -> QuerySet[Proxy]:
+    """Returns the verified proxies not leased at the moment
+    Args:
+        now: point in time to compare `leased_until` against
+        max_latency: highest p95 latency in ms, unknown latency excluded
+        kwargs: keyword arguments passed to <Proxy> objects filter
+    """
+    if max_latency is not None:
+        kwargs["latency_p95__lte"] = max_latency
+    return get_verified_proxies(**kwargs).filter(
+        Q(leased_until__isnull=True) | Q(leased_until__lte=now)
+    )
+
+
+def get_pool_proxies() -> QuerySet[Proxy]:
+    """Returns the verified proxies to pool, the highest scored first"""
+    return get_verified_proxies().order_by("-score")[
+        : settings.PROXY_POOL_SIZE
+    ]
+
+
+def refresh() -> list[dict]:
+    """Rebuilds the pool from the database
+    Returns:
+        list: proxies in `dict` form containing POOL_FIELDS
+    """
+    proxies = list(get_pool_proxies().values(*POOL_FIELDS))
+    cache.set_many(
+        {
+            POOL_KEY: proxies,
+            TRUNCATED_KEY: len(proxies) >= settings.PROXY_POOL_SIZE,
+        },
+        settings.PROXY_POOL_TTL,
+    )
+    logger.debug(f"Warm pool refreshed with {len(proxies)} proxies")
+    return proxies
+
+
+def get_pool() -> list[dict]:
+    """Returns the pooled proxies, rebuilding the pool if it is missing"""
+    proxies = cache.get(POOL_KEY)
+    if proxies is None:
+        proxies = refresh()
+    return proxies
+
+
+def evict(proxy_id: int) -> None:
+    """Drops a proxy from the pool until its next rebuild, ie. once leased
+    Last writer wins, a lost eviction is made up for by the rebuild.
+    """
+    proxies = cache.get(POOL_KEY)
+    if proxies and any(p["id"] == proxy_id for p in proxies):
+        proxies = [p for p in proxies if p["id"] != proxy_id]
+        cache.set(POOL_KEY, proxies, settings.PROXY_POOL_TTL)
+
+
+def get_matching(max_latency: int = None, **kwargs: dict) -> list[dict]:
+    """Returns the pooled proxies matching the given values
+    Proxies leased to a client are never served, see `scraper.leases`.
+    Args:
+        max_latency: highest p95 latency in ms, unknown latency excluded
+        kwargs: POOL_FIELDS values the proxy must have, ie. protocol="HTTP"
+    """
+    now = timezone.now()
+    proxies = [
+        p
+        for p in get_pool()
+        if p["leased_until"] is None or p["leased_until"] <= now
+    ]
+    if kwargs:
+        proxies = [
+            p for p in proxies if all(p[k] == v for k, v in kwargs.items())
+        ]
+    if max_latency is not None:
+        proxies = [
+            p
+            for p in proxies
+            if p["latency_p95"] is not None and p["latency_p95"] <= max_latency
+        ]
+    return proxies
+
+
+def get_candidates(count: int, **kwargs: dict) -> list[dict]:
+    """Returns the pooled proxies matching the filters, topped up to `count`
+    The pool holds the highest scored proxies only, filtered requests it
+    cannot fill are made up for with the best scored matches beyond it,
+    if the pool left any out.
+    Args:
+        count: number of proxies wanted
+        kwargs: filters, see `get_matching`
+    """
+    proxies = get_matching(**kwargs)
+    if kwargs and len(proxies) < count and cache.get(TRUNCATED_KEY, True):
+        proxies += (
+            get_leasable(timezone.now(), **kwargs)
+            .exclude(id__in=[p["id"] for p in proxies])
+            .order_by("-score")
+            .values(*POOL_FIELDS)[: count - len(proxies)]
+        )
+    return proxies
+
+
+def pick(**kwargs: dict) -> typing.Optional[dict]:
+    """Returns a random pooled proxy, None if there is none
+    The higher scored the likelier, see `scraper.scoring.weighted_choice`.
+    Args:
+        kwargs: filters, see `get_candidates`
+    """
+    proxies = get_candidates(1, **kwargs)
+    if not proxies:
+        return None
+    return weighted_choice(proxies, [p["score"] for p in proxies])
+
+
+def pick_many(count: int, **kwargs: dict) -> list[dict]:
+    """Returns up to `count` distinct random pooled proxies
+    The higher scored the likelier, see `scraper.scoring.weighted_shuffle`.
+    Args:
+        count: number of proxies wanted
+        kwargs: filters, see `get_candidates`
+    """
+    proxies = get_candidates(count, **kwargs)
+    return weighted_shuffle(proxies, [p["score"] for p in proxies])[:count]
@@ -0,0 +1,865 @@
+"""
+Asynchronous proxy verification engine.
+
+Probes run as non-blocking coroutines on a single event loop, bounded by a
+fixed number of workers, so thousands of proxies can be in flight at once
+instead of one blocking request per thread.
+"""
+import asyncio
+import ipaddress
+import json
+import queue
+import random
+import re
+import socket
+import ssl
+import struct
+import threading
+import time
+import typing
+from logging import getLogger
+from urllib.parse import urlsplit
+
+import requests
+from django.conf import settings
+
+from project.user_agents import USER_AGENTS
+from scraper import targets
+from scraper.models import Anonymity, Protocol
+
+logger = getLogger(__name__)
+
+SSL_CONTEXT = ssl.create_default_context()
+
+# request headers that give away a proxy, lower case
+PROXY_HEADERS = (
+    "via",
+    "x-forwarded-for",
+    "forwarded",
+    "x-real-ip",
+    "x-proxy-id",
+    "proxy-connection",
+)
+
+SOCKS_PROTOCOLS = (Protocol.SOCKS4[0], Protocol.SOCKS5[0])
+
+# SOCKS5 greeting offering no authentication, and an HTTP request line
+SNIFF_GREETING = b"\x05\x01\x00 / HTTP/1.0\r\n\r\n"
+
+_DONE = object()  # sentinel marking the end of a probe run
+
+RESPONSE_LIMIT = 64 * 1024  # bytes of a response read at most
+
+# public ip address of this host by judge URL, only once it is known
+_real_ips: dict[str, str] = {}
+
+
+class ProtocolMismatch(ConnectionError):
+    """The proxy answered in a protocol other than the one it was probed in"""
+
+
+async def _connect(ip: str, port: typing.Union[int, str]) -> socket.socket:
+    """Opens a non-blocking TCP connection to ip:port"""
+    family = (
+        socket.AF_INET6
+        if ipaddress.ip_address(ip).version == 6
+        else socket.AF_INET
+    )
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setblocking(False)
+    try:
+        await asyncio.get_running_loop().sock_connect(sock, (ip, int(port)))
+    except BaseException:
+        sock.close()
+        raise
+    return sock
+
+
+async def _read_until(
+    sock: socket.socket, marker: bytes = None, limit: int = RESPONSE_LIMIT
+) -> bytes:
+    """Reads from the socket until `marker` is seen or the peer hangs up"""
+    loop = asyncio.get_running_loop()
+    data = b""
+    while not (marker and marker in data) and len(data) < limit:
+        chunk = await loop.sock_recv(sock, 4096)
+        if not chunk:
+            break
+        data += chunk
+    return data
+
+
+async def _read_exactly(sock: socket.socket, size: int) -> bytes:
+    """Reads `size` bytes from the socket, fewer if the peer hangs up"""
+    loop = asyncio.get_running_loop()
+    data = b""
+    while len(data) < size:
+        chunk = await loop.sock_recv(sock, size - len(data))
+        if not chunk:
+            break
+        data += chunk
+    return data
+
+
+def _headers(head: bytes) -> dict[bytes, bytes]:
+    """Header fields of an HTTP response head, names in lower case"""
+    fields = (line.partition(b":") for line in head.split(b"\r\n")[1:])
+    return {name.strip().lower(): value.strip() for name, _, value in fields}
+
+
+def _is_complete(data: bytes) -> bool:
+    """Whether the response read so far holds its whole body"""
+    head, sep, body = data.partition(b"\r\n\r\n")
+    if not sep:
+        return False
+    headers = _headers(head)
+    if headers.get(b"transfer-encoding", b"").lower() == b"chunked":
+        return body.endswith(b"0\r\n\r\n")
+    try:
+        return len(body) >= int(headers[b"content-length"])
+    except (KeyError, ValueError):
+        return False  # delimited by the end of the connection
+
+
+async def _read_response(
+    recv: typing.Callable[[], typing.Awaitable[bytes]], data: bytes
+) -> bytes:
+    """Reads the rest of a response, up to RESPONSE_LIMIT bytes
+    Args:
+        recv: reads the next chunk off the connection, empty at its end
+        data: the response read so far
+    """
+    while not _is_complete(data) and len(data) < RESPONSE_LIMIT:
+        chunk = await recv()
+        if not chunk:
+            break
+        data += chunk
+    return data
+
+
+def _body(data: bytes) -> bytes:
+    """Body of a response, decoded if sent in chunks"""
+    head, _, body = data.partition(b"\r\n\r\n")
+    if _headers(head).get(b"transfer-encoding", b"").lower() != b"chunked":
+        return body
+    decoded = b""
+    while body:
+        size, _, body = body.partition(b"\r\n")
+        try:
+            size = int(size.split(b";")[0], 16)
+        except ValueError:
+            break
+        if not size:
+            break
+        decoded, body = decoded + body[:size], body[size:]
+        body = body[2:]  # CRLF ending the chunk
+    return decoded
+
+
+def _status_code(head: bytes) -> int:
+    """Parses the status code out of an HTTP response head, 0 if invalid"""
+    try:
+        return int(head.split(b" ", 2)[1])
+    except (IndexError, ValueError):
+        return 0
+
+
+def _request(method: str, target: str, host: str) -> bytes:
+    return (
+        f"{method} {target} HTTP/1.1\r\n"
+        f"Host: {host}\r\n"
+        f"User-Agent: {random.choice(USER_AGENTS)}\r\n"
+        "Accept: */*\r\n"
+        "Connection: close\r\n\r\n"
+    ).encode()
+
+
+def split_timeout(
+    timeout: typing.Union[float, tuple, None]
+) -> tuple[typing.Optional[float], typing.Optional[float]]:
+    """(connect, read) timeouts of a timeout given like requests takes it"""
+    if isinstance(timeout, (tuple, list)):
+        return timeout[0], timeout[1]
+    return timeout, timeout
+
+
+def timeouts(proxy: dict) -> tuple[float, float]:
+    """Connect and read timeouts of a probe, from the proxy's latency history
+    A multiple of the p95 connect time and time to first byte observed so
+    far, doubled for every failed check in a row, within the floor and
+    ceiling settings. Proxies without history get the ceilings.
+    Args:
+        proxy: Dictionary with `connect_p95`, `latency_p95` and `fail_streak`
+    Returns:
+        tuple: (connect, read) timeouts in seconds
+    """
+    factor = settings.PROXY_TIMEOUT_FACTOR * 2 ** (
+        proxy.get("fail_streak") or 0
+    )
+
+    def scaled(p95_ms: typing.Optional[int], floor: float, ceiling: float):
+        if not p95_ms:
+            return ceiling
+        return min(max(p95_ms / 1000 * factor, floor), ceiling)
+
+    return (
+        scaled(
+            proxy.get("connect_p95"),
+            settings.PROXY_CONNECT_TIMEOUT_MIN,
+            settings.PROXY_CONNECT_TIMEOUT_MAX,
+        ),
+        scaled(
+            proxy.get("latency_p95"),
+            settings.PROXY_READ_TIMEOUT_MIN,
+            settings.PROXY_READ_TIMEOUT_MAX,
+        ),
+    )
+
+
+async def _socks4(sock: socket.socket, host: str, port: int) -> bool:
+    """SOCKS4a CONNECT handshake, the proxy resolves `host` if not an ip"""
+    try:
+        address, name = ipaddress.IPv4Address(host).packed, b""
+    except ValueError:  # hostname, SOCKS4a
+        address, name = b"\x00\x00\x00\x01", host.encode() + b"\x00"
+    loop = asyncio.get_running_loop()
+    await loop.sock_sendall(
+        sock, struct.pack(">BBH", 4, 1, port) + address + b"\x00" + name
+    )
+    # an HTTP proxy waits for the end of the line, silent as the SOCKS4
+    # bytes contain none
+    try:
+        reply = await asyncio.wait_for(
+            _read_exactly(sock, 8), settings.PROXY_HANDSHAKE_TIMEOUT
+        )
+    except asyncio.TimeoutError:
+        reply = b""
+    if len(reply) < 2 or reply[0] != 0:
+        raise ProtocolMismatch(f"Not a SOCKS4 reply: {reply[:16]!r}")
+    return reply[1] == 0x5A  # request granted
+
+
+async def _socks5(sock: socket.socket, host: str, port: int) -> bool:
+    """SOCKS5 CONNECT handshake without authentication"""
+    loop = asyncio.get_running_loop()
+    await loop.sock_sendall(sock, b"\x05\x01\x00")  # no authentication
+    # the proxy answers the greeting itself, silence means it is no SOCKS5
+    try:
+        reply = await asyncio.wait_for(
+            _read_exactly(sock, 2), settings.PROXY_HANDSHAKE_TIMEOUT
+        )
+    except asyncio.TimeoutError:
+        reply = b""
+    if len(reply) < 2 or reply[0] != 5:
+        raise ProtocolMismatch(f"Not a SOCKS5 reply: {reply!r}")
+    if reply[1] != 0:
+        return False  # authentication required
+
+    name = host.encode()  # always by name, the proxy resolves it
+    connect = struct.pack(">4sB", b"\x05\x01\x00\x03", len(name))
+    await loop.sock_sendall(sock, connect + name + struct.pack(">H", port))
+    reply = await _read_exactly(sock, 4)
+    if len(reply) < 4 or reply[1] != 0:
+        return False
+    size = {1: 4, 4: 16}.get(reply[3])
+    if size is None:  # domain name, prefixed by its length
+        size = (await _read_exactly(sock, 1) or b"\x00")[0]
+    await _read_exactly(sock, size + 2)  # bound address and port
+    return True
+
+
+async def _tunnel(
+    sock: socket.socket, protocol: str, host: str, port: int
+) -> bool:
+    """Opens a tunnel to host:port through the proxy connected on `sock`
+    Args:
+        sock: connection to the proxy
+        protocol: <Protocol> code of the proxy; HTTP(S) proxies use CONNECT
+        host: target hostname or ip address
+        port: target port
+    Returns:
+        bool: True if the proxy opened the tunnel
+    Raises:
+        ProtocolMismatch: if the proxy does not speak `protocol`
+    """
+    if protocol == Protocol.SOCKS4[0]:
+        return await _socks4(sock, host, port)
+    if protocol == Protocol.SOCKS5[0]:
+        return await _socks5(sock, host, port)
+
+    authority = f"{host}:{port}"
+    await asyncio.get_running_loop().sock_sendall(
+        sock, _request("CONNECT", authority, authority)
+    )
+    head = await _read_until(sock, b"\r\n\r\n")
+    if head and not head.startswith(b"HTTP/"):
+        raise ProtocolMismatch(f"Not an HTTP reply: {head[:16]!r}")
+    return _status_code(head) == 200
+
+
+class Reply(typing.NamedTuple):
+    """Outcome of a request through a proxy"""
+
+    status: int = 0  # response status code, 0 if invalid
+    body: bytes = b""
+    connect_ms: int = 0  # time to connect to the proxy
+    ttfb_ms: int = 0  # time from sending the request to the status line
+
+    @property
+    def ok(self) -> bool:
+        """True for a 2xx/3xx response, like `requests.Response.ok`"""
+        return 200 <= self.status < 400
+
+
+async def request(
+    ip: str,
+    port: typing.Union[int, str],
+    url: str,
+    body: bool = False,
+    protocol: str = Protocol.HTTP[0],
+    timeout: typing.Union[float, tuple] = None,
+) -> Reply:
+    """Requests `url` through the proxy at ip:port
+    HTTP proxies are sent plain http URLs in absolute form, everything else
+    is tunnelled; with CONNECT through HTTP(S) proxies or with the SOCKS
+    handshake through SOCKS proxies, and upgraded to TLS for https URLs.
+    Args:
+        ip: proxy ip address
+        port: proxy port
+        url: URL to request through the proxy
+        body: read the response body too, not just the status line
+        protocol: <Protocol> code of the proxy; default=HTTP
+        timeout: seconds allowed to connect, and then for the response, or
+            a (connect, read) tuple like requests takes; unbounded if None
+    Returns:
+        Reply: status code, body and timings of the response
+    Raises:
+        ProtocolMismatch: if the proxy does not speak `protocol`
+        asyncio.TimeoutError: if the connect or read timeout ran out
+    """
+    parts = urlsplit(url)
+    target_port = parts.port or (443 if parts.scheme == "https" else 80)
+    protocol = (protocol or Protocol.HTTP[0]).upper()
+    loop = asyncio.get_running_loop()
+
+    def elapsed_ms(since: float) -> int:
+        return round((loop.time() - since) * 1000)
+
+    connect_timeout, read_timeout = split_timeout(timeout)
+    start = loop.time()
+    sock = await asyncio.wait_for(_connect(ip, port), connect_timeout)
+    connect_ms = elapsed_ms(start)
+
+    async def exchange() -> Reply:
+        if protocol == Protocol.HTTP[0] and parts.scheme != "https":
+            start = loop.time()
+            await loop.sock_sendall(sock, _request("GET", url, parts.netloc))
+            data = await _read_until(sock, b"\r\n")
+            ttfb_ms = elapsed_ms(start)
+            if data and not data.startswith(b"HTTP/"):
+                raise ProtocolMismatch(f"Not an HTTP reply: {data[:16]!r}")
+            if body:
+                data = await _read_response(
+                    lambda: loop.sock_recv(sock, 4096), data
+                )
+        else:
+            if not await _tunnel(sock, protocol, parts.hostname, target_port):
+                return Reply(connect_ms=connect_ms)
+
+            tls = parts.scheme == "https"
+            reader, writer = await asyncio.open_connection(
+                sock=sock,
+                ssl=SSL_CONTEXT if tls else None,
+                server_hostname=parts.hostname if tls else None,
+            )
+            try:
+                path = parts.path or "/"
+                if parts.query:
+                    path = f"{path}?{parts.query}"
+                start = loop.time()
+                writer.write(_request("GET", path, parts.netloc))
+                await writer.drain()
+                data = await reader.readline()
+                ttfb_ms = elapsed_ms(start)
+                if body:
+                    data = await _read_response(
+                        lambda: reader.read(4096), data
+                    )
+            finally:
+                writer.close()
+        return Reply(
+            _status_code(data),
+            _body(data),
+            connect_ms,
+            ttfb_ms,
+        )
+
+    try:
+        return await asyncio.wait_for(exchange(), read_timeout)
+    finally:
+        sock.close()
+
+
+async def fetch(
+    ip: str,
+    port: typing.Union[int, str],
+    url: str,
+    protocol: str = Protocol.HTTP[0],
+) -> bool:
+    """Tests whether `url` can be fetched through the proxy at ip:port
+    Returns:
+        bool: True for a 2xx/3xx response, like `requests.Response.ok`
+    """
+    return (await request(ip, port, url, protocol=protocol)).ok
+
+
+def timed(proxy: dict, reply: Reply) -> dict:
+    """Copy of the proxy dict carrying the timings of a passed probe"""
+    return {
+        **proxy,
+        "connect_ms": reply.connect_ms,
+        "ttfb_ms": reply.ttfb_ms,
+    }
+
+
+def _addresses(value: str) -> set[str]:
+    """Addresses named in a header value, ie. X-Forwarded-For or Forwarded
+    Lists are split on commas and whitespace, quotes and brackets dropped
+    and ports stripped, so only whole addresses compare equal.
+    """
+    tokens = re.split(r'[\s,;="\[\]]+', value)
+    return {
+        token.rpartition(":")[0] if token.count(":") == 1 else token
+        for token in tokens
+        if token
+    }
+
+
+def classify(judgement: dict, real_ip: str = None) -> str:
+    """Derives the anonymity of a proxy from the judge's echo
+    Args:
+        judgement: response of the judge view; client `ip` and `headers`
+        real_ip: public ip address of the checker itself
+    Returns:
+        str: <Anonymity> code; transparent if the real ip leaked, anonymous
+            if the request was flagged as proxied, elite otherwise
+    """
+    headers = {k.lower(): v for k, v in judgement.get("headers", {}).items()}
+    seen = [judgement.get("ip"), *map(str, headers.values())]
+    if real_ip and any(
+        real_ip in _addresses(value) for value in seen if value
+    ):
+        return Anonymity.TRANSPARENT[0]
+    if any(h in headers for h in PROXY_HEADERS):
+        return Anonymity.ANONYMOUS[0]
+    return Anonymity.ELITE[0]
+
+
+async def judge(
+    proxy: dict,
+    url: str,
+    real_ip: str = None,
+    timeout: typing.Union[float, tuple] = None,
+) -> tuple[bool, dict]:
+    """Probes the proxy with a single request to the judge view
+    Args:
+        proxy: Dictionary containing ip, port, protocol, etc
+        url: URL of the judge view, see `scraper.views.JudgeAPI`
+        real_ip: public ip address of the checker itself
+        timeout: Seconds allowed to connect and to respond, or a (connect,
+            read) tuple; default=`timeouts` of the proxy
+    Returns:
+        tuple[bool, dict]: Status of Proxy, Proxy details with `anonymity`
+            and timings if passed
+    """
+    ip, port = proxy.get("ip"), proxy.get("port")
+    try:
+        reply = await request(
+            ip,
+            port,
+            url,
+            body=True,
+            protocol=proxy.get("protocol"),
+            timeout=timeout or timeouts(proxy),
+        )
+        if reply.status != 200:
+            return False, proxy
+        anonymity = classify(json.loads(reply.body), real_ip)
+        return True, {**timed(proxy, reply), "anonymity": anonymity}
+    except Exception as e:
+        logger.error(f"<{ip}:{port}> {e!r}")
+        return False, proxy
+
+
+def get_real_ip(judge_url: str) -> typing.Optional[str]:
+    """Public ip address of this host, as seen by the judge without proxy
+    Remembered once known, a failed lookup is retried on the next call.
+    """
+    if settings.PROXY_REAL_IP:
+        return settings.PROXY_REAL_IP
+    if judge_url not in _real_ips:
+        try:
+            ip = requests.get(judge_url, timeout=10).json().get("ip")
+        except Exception as e:
+            logger.error(f"<{judge_url}> {e}")
+            return None
+        if not ip:
+            return None
+        _real_ips[judge_url] = ip
+    return _real_ips[judge_url]
+
+
+def quorum(passed: int, failed: int, total: int) -> typing.Optional[bool]:
+    """Verdict of a proxy test as soon as it can no longer change
+    A proxy passes when all but one of the test URLs succeed, a single test
+    URL must succeed on its own.
+    Args:
+        passed: number of test URLs that succeeded so far
+        failed: number of test URLs that failed so far
+        total: number of test URLs in the test
+    Returns:
+        bool | None: the verdict, or None while it is still undecided
+    """
+    required = max(total - 1, 1)
+    if passed >= required:
+        return True
+    if total - failed < required:
+        return False
+    return None
+
+
+async def probe(
+    proxy: dict,
+    test_urls: typing.Union[tuple, list] = None,
+    timeout: typing.Union[float, tuple] = None,
+    judge_url: str = None,
+    real_ip: str = None,
+) -> tuple[bool, dict]:
+    """Async counterpart of `scraper.utils.test_ip_port`
+    All test URLs are fetched concurrently and the outstanding fetches are
+    cancelled once the `quorum` verdict is certain, so a probe takes at most
+    one connect and one read timeout regardless of the number of test URLs.
+    The proxy is spoken to in its own `protocol`, a proxy that answers in
+    another protocol fails without waiting for the timeout.
+    Args:
+        proxy [dict]: Dictionary containing ip, port, protocol, etc
+        test_urls[tuple|list]: URLs to test the proxy against; drawn from
+            the `scraper.targets` pool, which is told how they fared
+        timeout [float|tuple]: Seconds allowed to connect and to respond,
+            or a (connect, read) tuple; default=`timeouts` of the proxy
+        judge_url [str]: Probe with a single `judge` request instead
+        real_ip [str]: Public ip address of the checker, for the judge
+    Returns:
+        tuple[bool, dict]: Status of Proxy, Proxy details with the timings
+            of the fastest passed test URL if the proxy passed
+    """
+    ip, port = proxy.get("ip"), proxy.get("port")
+    timeout = timeout or timeouts(proxy)
+    if judge_url:
+        return await judge(proxy, judge_url, real_ip, timeout)
+    if not test_urls:
+        test_urls = targets.get_test_urls()
+
+    async def attempt(url: str) -> tuple[str, Reply]:
+        try:
+            return url, await request(
+                ip, port, url, protocol=proxy.get("protocol"), timeout=timeout
+            )
+        except Exception as e:
+            logger.error(f"<{ip}:{port}> {e!r}")
+            return url, Reply()
+
+    tasks = [asyncio.ensure_future(attempt(url)) for url in test_urls]
+    passed = failed = 0
+    verdict = quorum(passed, failed, len(tasks))
+    fastest, results = None, []
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            url, reply = await next_done
+            results.append((url, reply.ok, reply.ttfb_ms))
+            if reply.ok:
+                passed += 1
+                fastest = fastest or reply
+            else:
+                failed += 1
+            verdict = quorum(passed, failed, len(tasks))
+            if verdict is not None:
+                break  # before taking the next, never awaited otherwise
+    finally:
+        for task in tasks:
+            task.cancel()  # verdict is certain, drop the remaining fetches
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    if verdict:
+        targets.record(results)
+    if verdict and fastest:
+        return True, timed(proxy, fastest)
+    return bool(verdict), proxy
+
+
+async def reachable(
+    ip: str, port: typing.Union[int, str], timeout: float
+) -> bool:
+    """Tests whether ip:port accepts a TCP connection within `timeout`
+    Raises:
+        asyncio.TimeoutError: if the connection attempt timed out
+    """
+    try:
+        sock = await asyncio.wait_for(_connect(ip, port), timeout)
+    except asyncio.TimeoutError:
+        raise  # an OSError as well since python 3.11
+    except (OSError, ValueError):
+        return False
+    sock.close()
+    return True
+
+
+def _sniff(reply: bytes) -> typing.Optional[str]:
+    """<Protocol> code of a proxy, by its answer to a SOCKS5 greeting"""
+    if reply.startswith(b"HTTP/"):
+        return Protocol.HTTP[0]  # rejected the greeting as a bad request
+    if reply[:1] == b"\x05":
+        return Protocol.SOCKS5[0]
+    if reply[:1] == b"\x00":  # SOCKS4 reply, rejecting the version
+        return Protocol.SOCKS4[0]
+    return None
+
+
+async def detect(
+    ip: str, port: typing.Union[int, str], timeout: float
+) -> typing.Optional[str]:
+    """Detects the protocol the proxy at ip:port speaks, in one connection
+    The SOCKS5 greeting sent doubles as an HTTP request line, it is
+    answered with a method selection by SOCKS5 proxies, a rejection by
+    SOCKS4 proxies and an error response by HTTP proxies. HTTP proxies are
+    not told apart from HTTPS (CONNECT capable) ones.
+    Args:
+        ip: proxy ip address
+        port: proxy port
+        timeout: seconds allowed for the connection and for the answer
+    Returns:
+        str | None: <Protocol> code, None if the answer was inconclusive
+    Raises:
+        asyncio.TimeoutError: if the connection attempt timed out
+        OSError: if the connection was refused
+    """
+    sock = await asyncio.wait_for(_connect(ip, port), timeout)
+    loop = asyncio.get_running_loop()
+    try:
+        await loop.sock_sendall(sock, SNIFF_GREETING)
+        reply = await asyncio.wait_for(loop.sock_recv(sock, 16), timeout)
+    except (asyncio.TimeoutError, OSError):
+        return None  # connected, but no (usable) answer
+    finally:
+        sock.close()
+    return _sniff(reply)
+
+
+def detected(proxy: dict, protocol: typing.Optional[str]) -> dict:
+    """Proxy dict with its `protocol` corrected by `detect`, if need be"""
+    listed = (proxy.get("protocol") or Protocol.HTTP[0]).upper()
+    if not protocol or listed == protocol:
+        return proxy
+    if protocol == Protocol.HTTP[0] and listed == Protocol.HTTPS[0]:
+        return proxy  # detection cannot tell CONNECT support apart
+    return {**proxy, "protocol": protocol}
+
+
+async def _work(
+    items: typing.Iterable,
+    handle: typing.Callable[[typing.Any], typing.Awaitable],
+    concurrency: int,
+    stop: threading.Event = None,
+) -> None:
+    """Runs `handle` over items with at most `concurrency` in flight"""
+    pending = iter(items)  # shared by all workers, handed out one by one
+
+    async def worker():
+        for item in pending:
+            if stop and stop.is_set():
+                return
+            await handle(item)
+
+    await asyncio.gather(*(worker() for _ in range(max(concurrency, 1))))
+
+
+async def prefilter(
+    proxies: typing.Iterable[dict],
+    callback: typing.Callable[[tuple[bool, dict]], typing.Any],
+    stats: dict,
+    timeout: float = None,
+    concurrency: int = None,
+    probe_timeout: typing.Union[float, tuple] = None,
+    stop: threading.Event = None,
+    detect_protocol: bool = False,
+) -> list[dict]:
+    """Drops proxies that do not even accept a TCP connection
+    Unreachable proxies are reported as failed through `callback` right
+    away, without paying for the HTTP verification.
+    Args:
+        proxies: proxies in `dict` form containing `ip`, `port`, etc
+        callback: called with the (False, proxy) of every unreachable proxy
+        stats: updated with `reachable`, `unreachable` and `saved` seconds
+        timeout: connect timeout; default=PROXY_PREFILTER_TIMEOUT
+        concurrency: connects in flight; PROXY_PREFILTER_CONCURRENCY
+        probe_timeout: timeout of the HTTP verification that is skipped;
+            default=`timeouts` of the proxy
+        stop: event that makes the workers stop picking up new proxies
+        detect_protocol: `detect` the protocol over the same connection,
+            correcting the `protocol` of the proxies that passed
+    Returns:
+        list: proxies that accepted a connection
+    """
+    timeout = timeout or settings.PROXY_PREFILTER_TIMEOUT
+    concurrency = concurrency or settings.PROXY_PREFILTER_CONCURRENCY
+    for key in ("reachable", "unreachable", "saved"):
+        stats.setdefault(key, 0)
+    passed = []
+
+    async def attempt(proxy: dict) -> None:
+        ip, port = proxy.get("ip"), proxy.get("port")
+        try:
+            if detect_protocol:
+                try:
+                    proxy = detected(proxy, await detect(ip, port, timeout))
+                    ok = True
+                except asyncio.TimeoutError:
+                    raise  # an OSError as well since python 3.11
+                except (OSError, ValueError):
+                    ok = False
+            else:
+                ok = await reachable(ip, port, timeout)
+            saved = 0  # refused connections fail just as fast over HTTP
+        except asyncio.TimeoutError:
+            connect_timeout = split_timeout(probe_timeout or timeouts(proxy))[
+                0
+            ]
+            ok, saved = False, max(connect_timeout - timeout, 0)
+        if ok:
+            stats["reachable"] += 1
+            passed.append(proxy)
+        else:
+            stats["unreachable"] += 1
+            stats["saved"] += saved
+            callback((False, proxy))
+
+    await _work(proxies, attempt, concurrency, stop)
+    return passed
+
+
+async def probe_all(
+    proxies: typing.Iterable[dict],
+    callback: typing.Callable[[tuple[bool, dict]], typing.Any],
+    concurrency: int = None,
+    stop: threading.Event = None,
+    **kwargs,
+) -> None:
+    """Probes proxies with at most `concurrency` probes in flight
+    Args:
+        proxies: proxies in `dict` form containing `ip`, `port`, etc
+        callback: called with the (status, proxy) result of every probe
+        concurrency: number of concurrent probes; PROXY_CHECK_CONCURRENCY
+        stop: event that makes the workers stop picking up new proxies
+        kwargs: keyword arguments passed to `probe`
+    """
+
+    async def attempt(proxy: dict) -> None:
+        callback(await probe(proxy, **kwargs))
+
+    concurrency = concurrency or settings.PROXY_CHECK_CONCURRENCY
+    await _work(proxies, attempt, concurrency, stop)
+
+
+def probe_proxies(
+    proxies: typing.Iterable[dict],
+    test_urls: typing.Union[tuple, list] = None,
+    timeout: typing.Union[float, tuple] = None,
+    concurrency: int = None,
+    connect_first: bool = True,
+    stats: dict = None,
+    judge_url: str = None,
+    detect_protocol: bool = False,
+    deadline: float = None,
+) -> typing.Iterator[tuple[bool, dict]]:
+    """Yields (status, proxy) tuples as the probes complete
+    The event loop runs in a background thread so that callers, ie. the
+    database write-back in `scraper.check`, stay synchronous.
+    Args:
+        proxies: proxies in `dict` form containing `ip`, `port`, etc
+        test_urls: URLs to test the proxies against; drawn per probe
+        timeout: seconds allowed to connect and to respond, or a (connect,
+            read) tuple; default=`timeouts` of each proxy
+        concurrency: number of concurrent probes; PROXY_CHECK_CONCURRENCY
+        connect_first: run the TCP `prefilter` over the batch beforehand
+        stats: filled with the `prefilter` statistics of the run
+        judge_url: judge view to probe and classify anonymity with, used
+            unless test_urls are given; default=PROXY_JUDGE_URL
+        detect_protocol: correct the listed `protocol` of the proxies with
+            `detect` during the prefilter, see `prefilter`
+        deadline: `time.monotonic()` after which no new probes are started,
+            the ones in flight are still completed and yielded
+    Raises:
+        Exception: the failure of the engine, after the results before it
+    """
+    proxies = list(proxies)  # evaluate querysets outside of the loop
+    if not proxies:
+        return
+    real_ip = None
+    if not test_urls:
+        judge_url = judge_url or settings.PROXY_JUDGE_URL
+        if judge_url:
+            real_ip = get_real_ip(judge_url)
+    else:
+        judge_url = None  # explicit test URLs take precedence
+
+    results: queue.Queue = queue.Queue()
+    stop = threading.Event()
+    stats = stats if stats is not None else {}
+
+    async def stages():
+        pending = proxies
+        if connect_first:
+            pending = await prefilter(
+                pending,
+                results.put,
+                stats,
+                probe_timeout=timeout,
+                stop=stop,
+                detect_protocol=detect_protocol,
+            )
+        await probe_all(
+            pending,
+            results.put,
+            concurrency=concurrency,
+            stop=stop,
+            test_urls=test_urls,
+            timeout=timeout,
+            judge_url=judge_url,
+            real_ip=real_ip,
+        )
+
+    def run():
+        try:
+            asyncio.run(stages())
+        except Exception as e:
+            logger.error(e)
+            results.put(e)  # raised to the consumer, see below
+        finally:
+            results.put(_DONE)
+
+    timer = None
+    if deadline is not None:
+        timer = threading.Timer(max(deadline - time.monotonic(), 0), stop.set)
+        timer.start()
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    try:
+        while (result := results.get()) is not _DONE:
+            if isinstance(result, Exception):
+                raise result  # recorded as the error of the check
+            yield result
+    finally:
+        stop.set()  # consumer went away, let in-flight probes drain
+        thread.join()
+        if timer:
+            timer.cancel()
@@ -0,0 +1,89 @@
+"""
+Selection score of a proxy, from 0 to 100.
+
+A weighted sum of how reliable, fast, seasoned and anonymous a proxy is,
+discounted by half for every failed check in a row. Recomputed from the
+results of every check, see `scraper.check.ResultBuffer`.
+"""
+import random
+import typing
+from datetime import datetime
+
+from django.utils import timezone
+
+from scraper.models import Anonymity
+
+# weights of the score components, each ranging from 0 to 1
+SCORE_WEIGHTS = {
+    "reliability": 40,  # share of checks passed
+    "speed": 25,  # p50 time to first byte
+    "tail": 10,  # p95 time to first byte
+    "experience": 10,  # number of checks passed
+    "age": 5,  # days since it was found
+    "anonymity": 10,  # level of anonymity
+}
+ANONYMITY_LEVELS = {
+    Anonymity.ELITE[0]: 1.0,
+    Anonymity.ANONYMOUS[0]: 0.6,
+    Anonymity.UNKNOWN[0]: 0.3,
+    Anonymity.TRANSPARENT[0]: 0.1,
+}
+MIN_WEIGHT = 1  # unscored proxies still come up, if rarely
+EXPERIENCED_AFTER = 20  # passed checks
+SEASONED_AFTER = 30  # days
+
+
+def speed(latency_ms: typing.Optional[int]) -> float:
+    """1 for instant responses, 0.5 at one second, 0.5 if unknown"""
+    if latency_ms is None:
+        return 0.5
+    return 1 / (1 + latency_ms / 1000)
+
+
+def score(
+    passed: int,
+    failed: int,
+    latency_p50: int = None,
+    latency_p95: int = None,
+    anonymity: str = None,
+    created_at: datetime = None,
+    fail_streak: int = 0,
+) -> float:
+    """Scores a proxy by its check history
+    Args:
+        passed: number of checks passed, `checked_count`
+        failed: number of checks failed, `failed_count`
+        latency_p50: median time to first byte in ms
+        latency_p95: p95 time to first byte in ms
+        anonymity: <Anonymity> code
+        created_at: when the proxy was found
+        fail_streak: number of checks failed in a row
+    Returns:
+        float: score from 0 to 100
+    """
+    age = timezone.now() - created_at if created_at else None
+    components = {
+        "reliability": (passed + 1) / (passed + failed + 2),  # smoothed
+        "speed": speed(latency_p50),
+        "tail": speed(latency_p95),
+        "experience": min(passed / EXPERIENCED_AFTER, 1),
+        "age": min(age.days / SEASONED_AFTER, 1) if age else 0,
+        "anonymity": ANONYMITY_LEVELS.get(anonymity, 0),
+    }
+    total = sum(SCORE_WEIGHTS[k] * v for k, v in components.items())
+    return round(total / 2**fail_streak, 2)
+
+
+def weighted_shuffle(items: list, scores: list[float]) -> list:
+    """Random order of items, the higher scored the likelier to come first
+    Weighted sampling without replacement, unscored items weigh MIN_WEIGHT.
+    """
+    keys = [random.random() ** (1 / max(w or 0, MIN_WEIGHT)) for w in scores]
+    ordered = sorted(zip(keys, range(len(items))), reverse=True)
+    return [items[i] for _, i in ordered]
+
+
+def weighted_choice(items: list, scores: list[float]):
+    """Random item, the higher scored the likelier, see `weighted_shuffle`"""
+    weights = [max(w or 0, MIN_WEIGHT) for w in scores]
+    return random.choices(items, weights)[0]
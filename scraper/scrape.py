@@ -5,6 +5,7 @@ from bs4 import BeautifulSoup
 from django.db.models import QuerySet
 from django.utils import timezone
 
+from base.cache import bump_data_version
 from scraper import utils
 from scraper.models import Website, Page, Proxy, Scrape
 
@@ -83,7 +84,8 @@ def scrape_site(
         return [], obj
 
     logger.info(f"{site} Commenced scraping...")
-    pages = site.pages.select_related("site").filter(is_active=True)
+    # from the pages prefetched by `utils.get_sites`, if any
+    pages = [page for page in site.pages.all() if page.is_active]
     if obj and pages:
         obj.pages.add(*pages)
 
@@ -129,6 +131,7 @@ def scrape(
     obj.completed_at = timezone.now()
     obj.is_success = True
     obj.save()
+    bump_data_version()
 
     logger.debug(f"Scrape: {obj}, Proxies: {proxy_list}")
     return proxy_list
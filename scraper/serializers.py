@@ -1,6 +1,6 @@
 from rest_framework import serializers
 
-from scraper.models import Website, Page, Proxy
+from scraper.models import Website, Page, Proxy, Scrape, Check
 
 
 class WebsiteSerializer(serializers.ModelSerializer):
@@ -22,5 +22,39 @@ class PageSerializer(serializers.ModelSerializer):
 class ProxySerializer(serializers.ModelSerializer):
     class Meta:
         model = Proxy
-        exclude = ["found_in", "checked_count", "is_dead"]
-        read_only_fields = ("created_at", "updated_at", "checked_at")
+        exclude = [
+            "found_in",
+            "checked_count",
+            "failed_count",
+            "is_dead",
+            "fail_streak",
+            "next_check_at",
+            "latency_samples",
+            # served by the lease API, too short-lived for the cached reads
+            "lease_token",
+            "leased_at",
+            "leased_until",
+        ]
+        read_only_fields = (
+            "created_at",
+            "updated_at",
+            "checked_at",
+            "connect_ms",
+            "connect_p95",
+            "latency_ms",
+            "latency_p50",
+            "latency_p95",
+            "score",
+        )
+
+
+class ScrapeSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Scrape
+        exclude = ["pages"]
+
+
+class CheckSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Check
+        exclude = ["proxies"]
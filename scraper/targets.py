@@ -0,0 +1,165 @@
+"""
+Health-scored pool of the test targets proxies are verified against.
+
+Every probe draws a fresh set of targets, favouring the fast ones. Targets
+are only blamed for failures through proxies that passed on other targets,
+so a dead proxy never counts against them, and a target failing too often
+is benched for a while before it is tried again.
+"""
+import random
+import threading
+import time
+import typing
+from logging import getLogger
+
+from django.conf import settings
+
+from project.test_urls import TEST_URLS
+
+logger = getLogger(__name__)
+
+ALPHA = 0.1  # weight of the latest result in the moving averages
+
+
+class Target:
+    """Moving averages of the latency and error rate of a test target"""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.reset()
+
+    def reset(self) -> None:
+        self.latency_ms: typing.Optional[float] = None
+        self.error_rate = 0.0
+        self.samples = 0
+        self.benched_until: typing.Optional[float] = None
+
+    def record(self, ok: bool, latency_ms: int = None) -> None:
+        self.samples += 1
+        self.error_rate += ALPHA * ((0.0 if ok else 1.0) - self.error_rate)
+        if ok and latency_ms is not None:
+            if self.latency_ms is None:
+                self.latency_ms = float(latency_ms)
+            else:
+                self.latency_ms += ALPHA * (latency_ms - self.latency_ms)
+
+    def as_dict(self) -> dict:
+        return {
+            "latency_ms": self.latency_ms and round(self.latency_ms),
+            "error_rate": round(self.error_rate, 4),
+            "samples": self.samples,
+            "benched": self.benched_until is not None,
+        }
+
+
+class TargetPool:
+    """Hands out healthy test targets and keeps track of their health
+    Args:
+        urls: URLs of the test targets
+        max_error_rate: error rate beyond which a target is benched
+        min_samples: results needed before a target can be benched
+        cooldown: seconds a benched target stays out of rotation
+    """
+
+    def __init__(
+        self,
+        urls: typing.Iterable[str],
+        max_error_rate: float = None,
+        min_samples: int = None,
+        cooldown: float = None,
+    ):
+        self.targets = {url: Target(url) for url in urls}
+        self.max_error_rate = (
+            max_error_rate or settings.PROXY_TARGET_MAX_ERROR_RATE
+        )
+        self.min_samples = min_samples or settings.PROXY_TARGET_MIN_SAMPLES
+        self.cooldown = cooldown or settings.PROXY_TARGET_COOLDOWN
+        self.lock = threading.Lock()
+
+    def healthy(self) -> list[Target]:
+        """Targets in rotation, benched ones return after their cooldown"""
+        now = time.monotonic()
+        for target in self.targets.values():
+            if target.benched_until and target.benched_until <= now:
+                logger.info(f"<{target.url}> Test target back in rotation")
+                target.reset()  # on probation, with a clean slate
+        return [t for t in self.targets.values() if not t.benched_until]
+
+    def sample(self, k: int = None) -> tuple[str, ...]:
+        """Draws `k` distinct healthy targets, the faster the likelier
+        Args:
+            k: number of targets; default=PROXY_TEST_URLS_PER_PROBE
+        Returns:
+            tuple: URLs of the targets, the least benched if none is healthy
+        """
+        k = k or settings.PROXY_TEST_URLS_PER_PROBE
+        with self.lock:
+            candidates = self.healthy()
+            if not candidates:
+                candidates = sorted(
+                    self.targets.values(), key=lambda t: t.benched_until
+                )[:k]
+            known = [t.latency_ms for t in candidates if t.latency_ms]
+            typical = sorted(known)[len(known) // 2] if known else 1000.0
+            weights = [1 / (t.latency_ms or typical) for t in candidates]
+
+            chosen = []
+            while candidates and len(chosen) < k:
+                i = random.choices(range(len(candidates)), weights)[0]
+                chosen.append(candidates.pop(i).url)
+                weights.pop(i)
+            return tuple(chosen)
+
+    def record(self, url: str, ok: bool, latency_ms: int = None) -> None:
+        """Records the result of a test target, through a working proxy
+        Args:
+            url: URL of the target, others than the pool's are ignored
+            ok: whether the target responded successfully
+            latency_ms: time to first byte of the response, if ok
+        """
+        target = self.targets.get(url)
+        if not target:
+            return
+        with self.lock:
+            if target.benched_until:
+                return  # results of probes in flight when it was benched
+            target.record(ok, latency_ms)
+            failing = target.error_rate > self.max_error_rate
+            if failing and target.samples >= self.min_samples:
+                target.benched_until = time.monotonic() + self.cooldown
+                logger.warning(
+                    f"<{url}> Test target benched, "
+                    f"error rate {target.error_rate:.0%}"
+                )
+
+    def stats(self) -> dict:
+        """Health of every target, keyed by URL"""
+        with self.lock:
+            return {url: t.as_dict() for url, t in self.targets.items()}
+
+
+_pool: typing.Optional[TargetPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> TargetPool:
+    """Returns the target pool of this process, built from TEST_URLS"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = TargetPool(TEST_URLS)
+        return _pool
+
+
+def get_test_urls(k: int = None) -> tuple[str, ...]:
+    """Draws fresh test URLs for a single probe, see `TargetPool.sample`"""
+    return get_pool().sample(k)
+
+
+def record(results: typing.Iterable[tuple[str, bool, int]]) -> None:
+    """Records the (url, ok, latency_ms) results of a passed probe
+    Failed probes are left out, the proxy is the likelier one to blame.
+    """
+    pool = get_pool()
+    for url, ok, latency_ms in results:
+        pool.record(url, ok, latency_ms)
@@ -1,7 +1,8 @@
-from celery import shared_task
+from celery import chord, shared_task
 
 from scraper import scrape
-from scraper import check
+from scraper import check, leases, pool
+from scraper.models import Check
 
 
 @shared_task
@@ -11,6 +12,42 @@ def scrape_sites():
 
 
 @shared_task
-def check_proxies():
-    """Task: Check all available proxies"""
-    check.check()
+def check_proxies(due: bool = True):
+    """Task: Check available proxies, fanned out as shards over the workers
+    Resumes the latest paused check, if any, from its cursor.
+    """
+    obj = check.get_resumable() or Check.objects.create()
+    proxies = check.get_check_proxies(due, id__gt=obj.cursor or 0)
+    shards = check.get_shards(proxies)
+    if not shards:
+        check.complete(obj, [])
+        return
+    chord(check_shard.s(obj.pk, first, last, due) for first, last in shards)(
+        complete_check.s(obj.pk)
+    )
+
+
+@shared_task
+def check_shard(obj_pk: int, first: int, last: int, due: bool = True):
+    """Task: Check a single id range of proxies, within the time budget"""
+    deadline = check.get_deadline()  # counted from the start of the task
+    obj = Check.objects.get(pk=obj_pk)
+    return check.check_shard(obj, first, last, due, deadline)
+
+
+@shared_task
+def complete_check(results: list[dict], obj_pk: int):
+    """Task: Complete the check once all of its shards are done"""
+    check.complete(Check.objects.get(pk=obj_pk), results)
+
+
+@shared_task
+def refresh_pool():
+    """Task: Rebuild the warm pool of verified proxies"""
+    pool.refresh()
+
+
+@shared_task
+def sweep_leases():
+    """Task: Clear the expired proxy leases"""
+    leases.sweep()
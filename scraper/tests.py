@@ -1,3 +1,13 @@
+import asyncio
+import gc
+import gzip
+import json
+import tempfile
+import time
+import warnings
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
 from http import HTTPStatus
 from unittest import mock
 
@@ -5,17 +15,41 @@ import requests
 from bs4 import BeautifulSoup
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.core.management import call_command
+from django.db import connection
 from django.db.models import QuerySet
-from django.test import Client, TestCase
-from django.urls import reverse
+from django.test import Client, LiveServerTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+from django.utils import timezone
 from requests import Response
+from rest_framework import permissions, throttling
 from selenium.webdriver.chrome.webdriver import WebDriver
 
 import scraper.views
-from scraper import utils, tasks, check, scrape
-from scraper.models import Website, Page, Proxy, Check, Scrape
+from base import cache as cache_utils
+from scraper import (
+    utils,
+    tasks,
+    check,
+    scrape,
+    probe,
+    targets,
+    pool,
+    scoring,
+    leases,
+    verdicts,
+)
+from scraper.models import Anonymity, Website, Page, Proxy, Check, Scrape
 from scraper.scrapers import sslp, spy1, fpls, fpcz
+from utils.stubs import (
+    ForwardingProxyHandler,
+    Socks4ProxyHandler,
+    SocksProxyHandler,
+    StubProxyHandler,
+    StubProxyServer,
+)
 
 USER_MODEL = get_user_model()
 
@@ -31,6 +65,11 @@ class CommandTestCase(TestCase):
         with mock.patch("scraper.check.check") as mock_check:
             call_command("check_proxies")
             self.assertEqual(mock_check.call_count, 1)
+        with mock.patch(
+            "scraper.management.commands.check_proxies.check"
+        ) as mock_check:
+            call_command("check_proxies", "--all")
+            mock_check.assert_called_once_with(due=False, budget=None)
 
 
 class TasksTestCase(TestCase):
@@ -40,10 +79,45 @@ class TasksTestCase(TestCase):
             tasks.scrape_sites()
             self.assertEqual(mock_scrape.call_count, 1)
 
+    @override_settings(PROXY_CHECK_SHARD_SIZE=2)
     def test_check_proxies(self):
-        with mock.patch("scraper.check.check") as mock_check:
+        with mock.patch("scraper.tasks.chord") as mock_chord:
+            tasks.check_proxies()  # nothing to check
+            self.assertFalse(mock_chord.called)
+            self.assertTrue(Check.objects.get().is_success)
+
+            for i in range(3):
+                Proxy.objects.create(ip=f"127.0.3.{i}", port=80, country="BD")
             tasks.check_proxies()
-            self.assertEqual(mock_check.call_count, 1)
+            header = list(mock_chord.call_args.args[0])
+            self.assertEqual(len(header), 2)  # 3 proxies, 2 per shard
+            self.assertEqual(header[0].task, tasks.check_shard.name)
+
+    @mock.patch("scraper.check.probe_proxies")
+    def test_check_shard(self, mock_probe):
+        mock_probe.side_effect = lambda proxies, **kw: (
+            (True, p) for p in proxies
+        )
+        proxies = [
+            Proxy.objects.create(ip=f"127.0.4.{i}", port=80, country="BD")
+            for i in range(3)
+        ]
+        obj = Check.objects.create()
+        result = tasks.check_shard(obj.pk, proxies[0].pk, proxies[1].pk)
+        self.assertDictEqual(
+            result,
+            {"passed": 2, "failed": 0, "error": None, "resume_after": None},
+        )
+        self.assertEqual(obj.proxies.count(), 2)
+
+        tasks.complete_check(
+            [result, {"passed": 0, "failed": 0, "error": "boom"}], obj.pk
+        )
+        obj.refresh_from_db()
+        self.assertIsNotNone(obj.completed_at)
+        self.assertFalse(obj.is_success)
+        self.assertEqual(obj.error, "boom")
+        self.assertEqual(obj.stats["passed"], 2)
 
 
 class ScrapeTestCase(TestCase):
@@ -120,6 +194,154 @@ class ScrapeTestCase(TestCase):
         proxy = utils.get_random_working_proxy("dict", ("https://google.com",))
         self.assertDictEqual(proxy, p_dict)
 
+    @mock.patch("scraper.utils.test_ip_port")
+    def test_verdicts(self, mock_test_ip_port) -> None:
+        cache.clear()
+        proxies = [
+            Proxy.objects.create(
+                ip=f"127.0.5.{i}",
+                port=8080,
+                country="BD",
+                protocol="HTTP",
+                anonymity=Anonymity.ELITE[0],
+            )
+            for i in range(3)
+        ]
+        works = proxies[1]
+        mock_test_ip_port.side_effect = lambda **kw: (
+            kw["ip"] == works.ip,
+            {k: kw[k] for k in ("ip", "port", "protocol")},
+        )
+        test_urls = ("https://example.com/a", "https://example.com/b")
+        target = verdicts.get_target(test_urls)
+        self.assertEqual(target, "example.com")
+        with override_settings(PROXY_TEST_PARALLEL=1):  # in score order
+            proxy = utils.get_random_working_proxy(
+                test_urls=test_urls, ip__startswith="127.0.5."
+            )
+        self.assertEqual(proxy, works)
+        self.assertListEqual(verdicts.get_working(target), [works.pk])
+        tested = mock_test_ip_port.call_count
+
+        # answered from the cache, without testing
+        proxy = utils.get_random_working_proxy(
+            "dict", test_urls, ip__startswith="127.0.5."
+        )
+        self.assertEqual(proxy["ip"], works.ip)
+        self.assertEqual(mock_test_ip_port.call_count, tested)
+
+        # failures are cached too, and never tested again while fresh
+        for p in proxies:
+            verdicts.record(target, p.pk, p != works)
+        self.assertSetEqual(
+            verdicts.get_failed(target, [p.pk for p in proxies]), {works.pk}
+        )
+        self.assertEqual(len(verdicts.get_working(target)), 2)
+        works.is_dead = True  # known to work, but no longer a candidate
+        works.save()
+        mock_test_ip_port.reset_mock()
+        proxy = utils.get_random_working_proxy(
+            test_urls=test_urls, ip=works.ip
+        )
+        self.assertIsNone(proxy)
+        self.assertFalse(mock_test_ip_port.called)
+
+        # tested on the shared threads, none are started per request
+        with mock.patch("scraper.utils.ThreadPoolExecutor") as mock_pool:
+            proxy, _ = utils.get_first_working(proxies, test_urls, target)
+        self.assertEqual(proxy, works)
+        self.assertFalse(mock_pool.called)
+        # every test fetches all its URLs at once, none waits for a thread
+        self.assertGreaterEqual(
+            utils._fetches._max_workers,
+            settings.PROXY_TEST_WORKERS * settings.PROXY_TEST_URLS_PER_PROBE,
+        )
+
+        # hosts only, hashed into the cache keys
+        with self.assertRaises(ValueError):
+            verdicts.get_target(["https://example.com/", "example.com/a"])
+        long_target = verdicts.get_target([f"https://{'a' * 200}.com/"])
+        key = verdicts._key(verdicts.WORKING_KEY, long_target)
+        self.assertEqual(len(key), len("scraper:working:") + 32)  # md5
+
+    def test_sample_proxies(self) -> None:
+        created = [
+            Proxy.objects.create(ip=f"127.0.4.{i}", port=8080, country="BD")
+            for i in range(30)
+        ]
+        proxies = Proxy.objects.filter(pk__in=[p.pk for p in created])
+        with self.assertNumQueries(2):  # bounds, then shuffled by the db
+            self.assertEqual(len(utils.sample_proxies(proxies, 8)), 8)
+        pivots = [created[-3].pk, created[10].pk]
+        with self.assertNumQueries(4), mock.patch.object(
+            utils, "SAMPLE_SHUFFLE_MAX", 0
+        ):  # bounds, both sides of pivot, next
+            with mock.patch("random.randint", side_effect=pivots):
+                sample = utils.sample_proxies(proxies, 8)
+        # a slice from each pivot on, wrapping around to the lowest ids
+        self.assertListEqual(
+            [p.pk for p in sample],
+            [p.pk for p in created[-3:] + created[:2] + created[10:13]],
+        )
+        for shuffle_max in (0, utils.SAMPLE_SHUFFLE_MAX):
+            seen = set()
+            with mock.patch.object(utils, "SAMPLE_SHUFFLE_MAX", shuffle_max):
+                for _ in range(100):
+                    sample = utils.sample_proxies(proxies, 5)
+                    self.assertEqual(len({p.pk for p in sample}), 5)
+                    seen.update(p.pk for p in sample)
+            self.assertGreater(len(seen), 20)  # not always the same few
+        self.assertEqual(len(utils.sample_proxies(proxies.none(), 5)), 0)
+        self.assertEqual(len(utils.sample_proxies(proxies, 50)), 30)
+
+    def test_sample_distribution(self) -> None:
+        # scrape batches of consecutive ids
+        batches = []
+        for b in range(6):
+            batches.append(
+                [
+                    Proxy.objects.create(
+                        ip=f"127.0.{40 + b}.{i}", port=8080, country="BD"
+                    ).pk
+                    for i in range(10)
+                ]
+            )
+        batch_of = {pk: b for b, pks in enumerate(batches) for pk in pks}
+        proxies = Proxy.objects.filter(pk__in=batch_of)
+        draws, spread = Counter(), []
+        with mock.patch.object(utils, "SAMPLE_SHUFFLE_MAX", 0):  # pivots
+            for _ in range(300):
+                sample = [p.pk for p in utils.sample_proxies(proxies, 10)]
+                draws.update(sample)
+                spread.append(len({batch_of[pk] for pk in sample}))
+        # samples span several batches, ten consecutive ids span two at most
+        self.assertGreater(sum(spread) / len(spread), 2.2)
+        # and every proxy gets drawn, none several times as often as average
+        self.assertEqual(len(draws), 60)
+        self.assertLess(max(draws.values()), 3 * 300 * 10 / 60)
+
+    def test_sample_sparse(self) -> None:
+        # a few candidates among many proxies, clustered and spread out
+        Proxy.objects.bulk_create(
+            Proxy(ip=f"127.2.{i // 250}.{i % 250}", port=8080, country="BD")
+            for i in range(2000)
+        )
+        ids = list(Proxy.objects.order_by("id").values_list("id", flat=True))
+        candidates = ids[1000:1015] + ids[1100:2000:60]
+        Proxy.objects.filter(id__in=candidates).update(port=3128)
+        proxies = Proxy.objects.filter(port=3128)
+        for shuffle_max in (0, utils.SAMPLE_SHUFFLE_MAX):
+            draws, samples = Counter(), Counter()
+            with mock.patch.object(utils, "SAMPLE_SHUFFLE_MAX", shuffle_max):
+                for _ in range(200):
+                    sample = [p.pk for p in utils.sample_proxies(proxies, 5)]
+                    self.assertEqual(len(set(sample)), 5)
+                    draws.update(sample)
+                    samples[frozenset(sample)] += 1
+            self.assertGreater(len(draws), 20)  # most of them drawn
+            # never mostly the same, as when pivots missed the candidates
+            self.assertLess(max(samples.values()), 40)
+
     @mock.patch("scraper.utils.get_random_working_proxy")
     def test_get_page_source(self, mock_proxy) -> None:
         mock_proxy.return_value = None
@@ -131,7 +353,7 @@ class ScrapeTestCase(TestCase):
         self.assertIsNone(content)
 
         mock_proxy.return_value = self.proxy
-        with mock.patch.object(requests, "get") as mock_request:
+        with mock.patch.object(requests.Session, "get") as mock_request:
             response = Response()
             response.status_code = 200
             response._content = b"content"
@@ -189,7 +411,7 @@ class ScrapeTestCase(TestCase):
         with self.assertRaises(ValueError):
             utils.test_ip_port()
 
-        with mock.patch.object(requests, "get") as mock_request:
+        with mock.patch.object(requests.Session, "get") as mock_request:
             response = Response()
             response.status_code = 200
             mock_request.return_value = response
@@ -202,10 +424,63 @@ class ScrapeTestCase(TestCase):
             self.assertFalse(result)
             self.assertIn("ip", proxy)
 
+            # two failures out of three decide the verdict, third is skipped
+            mock_request.reset_mock()
+            result, _ = utils.test_ip_port(
+                self.test_ip_port, test_urls=("a", "b", "c"), parallel=False
+            )
+            self.assertFalse(result)
+            self.assertEqual(mock_request.call_count, 2)
+
+    def test_get_session(self) -> None:
+        session = utils.get_session()
+        self.assertIs(utils.get_session(), session)
+        self.assertIsNot(utils.get_session(cached=True), session)
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            other = executor.submit(utils.get_session).result()
+        self.assertIsNot(other, session)
+
+        class CountingHandler(StubProxyHandler):
+            connections = 0
+
+            def setup(self):
+                CountingHandler.connections += 1
+                super().setup()
+
+        # later probes reuse the connection kept alive through the proxy
+        with StubProxyServer(handler=CountingHandler) as stub:
+            proxy = {"ip": stub.ip, "port": stub.port, "protocol": "HTTP"}
+            for _ in range(3):
+                result, _ = utils.test_ip_port(
+                    proxy, test_urls=("http://stub.invalid/",)
+                )
+                self.assertTrue(result)
+        self.assertEqual(CountingHandler.connections, 1)
+
+        # the least recently used proxies are let go of
+        adapter = utils.BoundedAdapter()
+        with mock.patch("scraper.utils.HTTP_POOL_CONNECTIONS", 2):
+            for proxy in ("http://a:1", "http://b:1", "http://a:1"):
+                adapter.proxy_manager_for(proxy)
+            adapter.proxy_manager_for("http://c:1")
+        self.assertListEqual(
+            list(adapter.proxy_manager), ["http://a:1", "http://c:1"]
+        )
+
+    def test_quorum(self) -> None:
+        self.assertIsNone(probe.quorum(0, 0, 3))
+        self.assertIsNone(probe.quorum(1, 1, 3))
+        self.assertTrue(probe.quorum(2, 0, 3))
+        self.assertFalse(probe.quorum(0, 2, 3))
+        self.assertFalse(probe.quorum(0, 1, 1))
+        self.assertTrue(probe.quorum(1, 0, 1))
+
     def test_get_tested(self) -> None:
         existing_ip_port = {"ip": self.proxy.ip, "port": self.proxy.port}
-        with mock.patch("scraper.utils.test_ip_port") as mock_test_ip_port:
-            mock_test_ip_port.return_value = True, self.test_ip_port
+        with mock.patch("scraper.utils.probe_proxies") as mock_probe:
+            mock_probe.side_effect = lambda proxies, **kw: (
+                (True, p) for p in proxies
+            )
             tested = utils.get_tested([self.test_ip_port, existing_ip_port])
             self.assertIn(self.test_ip_port, tested)
             self.assertNotIn(existing_ip_port, tested)
@@ -216,10 +491,63 @@ class ScrapeTestCase(TestCase):
         saved = utils.save_to_db(self.page, [proxy, self.test_ip_port])
         self.assertIsInstance(saved[0], Proxy)
 
+        # invalid rows are skipped, the rest of the batch is saved
+        bad = [
+            {**proxy, "ip": "127.0.4.1", "country": "TOO LONG"},
+            {**proxy, "ip": "127.0.4.2", "anonymity": None},
+            {**proxy, "ip": "127.0.4.999"},
+            {**proxy, "ip": "127.0.4.3", "port": "x"},
+        ]
+        good = {**proxy, "ip": "127.0.4.4"}
+        with self.assertLogs("scraper.utils", "ERROR") as logs:
+            saved = utils.save_to_db(self.page, [*bad, good])
+        self.assertEqual(len(logs.records), len(bad))
+        self.assertListEqual([p.ip for p in saved], [good["ip"]])
+
+    def test_pipeline_query_budgets(self) -> None:
+        """Queries of the scrape stages do not grow with the number of rows"""
+        proxies = [
+            {
+                "ip": f"127.0.9.{i}",
+                "port": 8080,
+                "country": "BD",
+                "anonymity": "ANM",
+                "protocol": "HTTP",
+            }
+            for i in range(20)
+        ]
+        with mock.patch("scraper.utils.probe_proxies") as mock_probe:
+            mock_probe.side_effect = lambda proxies, **kw: (
+                (True, p) for p in proxies
+            )
+            for n in (2, 20):
+                with self.assertNumQueries(1):
+                    self.assertEqual(len(utils.get_tested(proxies[:n])), n)
+        for batch in (proxies[:2], proxies[2:]):
+            with self.assertNumQueries(4):
+                saved = utils.save_to_db(self.page, batch)
+            self.assertEqual(len(saved), len(batch))
+        with self.assertNumQueries(1):  # all of them exist by now
+            self.assertListEqual(utils.save_to_db(self.page, proxies), [])
+        self.assertEqual(self.page.found_in_pages.count(), 20)
+
+        with mock.patch("scraper.scrape.scrape_page") as mock_scrape_page:
+            mock_scrape_page.return_value = []
+            for n in (2, 20):
+                for i in range(n - self.site.pages.count()):
+                    Page.objects.create(site=self.site, path=f"/{i}")
+                site = utils.get_sites(pk=self.site.pk).get()
+                with self.assertNumQueries(2):  # adding the pages to obj
+                    scrape.scrape_site(site, obj=Scrape.objects.create())
+                self.assertEqual(mock_scrape_page.call_count, n)
+                with self.assertNumQueries(0):  # pages know their site
+                    mock_scrape_page.call_args[0][0].get_parser()
+                mock_scrape_page.reset_mock()
+
     @mock.patch("scraper.utils.get_proxies")
     def test_check(self, mock_get_proxies: mock.Mock) -> None:
         self.assertFalse(Check.objects.exists())
-        mock_get_proxies.return_value = [self.proxy]
+        mock_get_proxies.return_value = Proxy.objects.filter(pk=self.proxy.pk)
 
         with mock.patch("scraper.utils.test_ip_port") as mock_test_ip_port:
             mock_test_ip_port.return_value = True, {
@@ -308,6 +636,697 @@ class ScrapeTestCase(TestCase):
         self.assertListEqual(proxies, [])
 
 
+class ProbeTestCase(TestCase):
+    test_urls = ("http://stub.invalid/ip",)
+
+    def test_probe_proxies(self) -> None:
+        with StubProxyServer() as stub:
+            alive = {"ip": stub.ip, "port": stub.port, "protocol": "HTTP"}
+            results = list(
+                probe.probe_proxies(
+                    [alive] * 10, test_urls=self.test_urls, concurrency=4
+                )
+            )
+            self.assertEqual(len(results), 10)
+            self.assertTrue(all(status for status, _ in results))
+            self.assertLessEqual(alive.items(), results[0][1].items())
+            self.assertIn("connect_ms", results[0][1])
+            self.assertIn("ttfb_ms", results[0][1])
+
+        # stub is shut down, nothing is listening any more
+        status, _ = list(
+            probe.probe_proxies([alive], test_urls=self.test_urls * 2)
+        )[0]
+        self.assertFalse(status)
+        self.assertListEqual(list(probe.probe_proxies([])), [])
+
+    def test_probe_early_exit(self) -> None:
+        class SlowPathHandler(StubProxyHandler):
+            def do_GET(self):
+                if "slow" in self.path:
+                    time.sleep(5)
+                super().do_GET()
+
+        with StubProxyServer(handler=SlowPathHandler) as stub:
+            proxy = {"ip": stub.ip, "port": stub.port}
+            urls = ("http://a.invalid/", "http://b.invalid/")
+            start = time.monotonic()
+            with warnings.catch_warnings(record=True) as caught:
+                warnings.simplefilter("always")
+                status, _ = list(
+                    probe.probe_proxies(
+                        [proxy], test_urls=urls + ("http://slow.invalid/",)
+                    )
+                )[0]
+                gc.collect()
+            self.assertTrue(status)
+            self.assertLess(time.monotonic() - start, 5)
+            # no coroutine is left behind, never awaited
+            self.assertFalse(
+                [w for w in caught if "never awaited" in str(w.message)]
+            )
+
+    def test_prefilter(self) -> None:
+        with StubProxyServer() as stub:
+            alive = {"ip": stub.ip, "port": stub.port}
+            with StubProxyServer() as gone:
+                dead = {"ip": gone.ip, "port": gone.port}
+            stats = {}
+            results = dict(
+                (p["port"], status)
+                for status, p in probe.probe_proxies(
+                    [alive, dead], test_urls=self.test_urls, stats=stats
+                )
+            )
+        self.assertDictEqual(
+            results, {alive["port"]: True, dead["port"]: False}
+        )
+        self.assertDictEqual(
+            stats, {"reachable": 1, "unreachable": 1, "saved": 0}
+        )
+
+        # timed out connects are spared the full HTTP timeout
+        with mock.patch.object(probe, "reachable") as mock_reachable:
+            mock_reachable.side_effect = asyncio.TimeoutError
+            stats = {}
+            list(probe.probe_proxies([alive], timeout=30, stats=stats))
+            self.assertEqual(
+                stats["saved"], 30 - settings.PROXY_PREFILTER_TIMEOUT
+            )
+
+    @override_settings(PROXY_HANDSHAKE_TIMEOUT=0.2)
+    def test_probe_protocols(self) -> None:
+        with StubProxyServer() as origin:
+            urls = (f"http://{origin.ip}:{origin.port}/ip",) * 2
+            for protocol, handler in (
+                ("HTTP", StubProxyHandler),
+                ("HTTPS", ForwardingProxyHandler),
+                ("SOCKS4", Socks4ProxyHandler),
+                ("SOCKS5", SocksProxyHandler),
+            ):
+                with StubProxyServer(handler=handler) as stub:
+                    proxy = {
+                        "ip": stub.ip,
+                        "port": stub.port,
+                        "protocol": protocol,
+                    }
+                    status, _ = asyncio.run(probe.probe(proxy, urls))
+                    self.assertTrue(status, protocol)
+                    self.assertEqual(
+                        asyncio.run(probe.detect(stub.ip, stub.port, 1)),
+                        "HTTP" if "HTTP" in protocol else protocol,
+                    )
+
+            # a proxy spoken to in the wrong protocol fails fast
+            with StubProxyServer() as stub:
+                proxy = {"ip": stub.ip, "port": stub.port}
+                with self.assertRaises(probe.ProtocolMismatch):
+                    asyncio.run(
+                        probe.request(
+                            stub.ip, stub.port, urls[0], False, "SOCKS5"
+                        )
+                    )
+                start = time.monotonic()
+                status, _ = utils.test_ip_port(
+                    {**proxy, "protocol": "SOCKS5"}, test_urls=urls
+                )
+                self.assertFalse(status)
+                self.assertLess(time.monotonic() - start, 5)
+
+                # also when called from a coroutine, its loop running on
+                async def from_coroutine() -> tuple[bool, dict]:
+                    test = utils.test_ip_port(
+                        {**proxy, "protocol": "SOCKS5"}, test_urls=urls
+                    )
+                    ticks = 0
+                    while not test.done():
+                        await asyncio.sleep(0)
+                        ticks += 1
+                    self.assertGreater(ticks, 1)  # the loop was not blocked
+                    return await test
+
+                status, _ = asyncio.run(from_coroutine())
+                self.assertFalse(status)
+
+                # nor does SOCKS4 wait for the HTTP proxy to answer
+                start = time.monotonic()
+                with self.assertRaises(probe.ProtocolMismatch):
+                    asyncio.run(
+                        probe.request(
+                            stub.ip, stub.port, urls[0], False, "SOCKS4"
+                        )
+                    )
+                self.assertLess(time.monotonic() - start, 1)
+            with StubProxyServer(handler=SocksProxyHandler) as stub:
+                status, _ = asyncio.run(
+                    probe.probe({"ip": stub.ip, "port": stub.port}, urls)
+                )
+                self.assertFalse(status)
+
+        # the prefilter corrects the listed protocol, in the same connection
+        self.assertEqual(
+            probe.detected({"protocol": "HTTPS"}, "HTTP"),
+            {"protocol": "HTTPS"},
+        )
+        callback, stats = mock.Mock(), {}
+        with StubProxyServer(handler=SocksProxyHandler) as stub:
+            proxy = {"ip": stub.ip, "port": stub.port, "protocol": "HTTP"}
+            passed = asyncio.run(
+                probe.prefilter([proxy], callback, stats, detect_protocol=True)
+            )
+        self.assertEqual(passed[0]["protocol"], "SOCKS5")
+        self.assertFalse(callback.called)  # failures only
+        self.assertEqual(stats["reachable"], 1)
+
+    def test_target_pool(self) -> None:
+        urls = ("http://a.invalid/", "http://b.invalid/", "http://c.invalid/")
+        target_pool = targets.TargetPool(urls, 0.5, min_samples=4, cooldown=60)
+        sample = target_pool.sample(3)
+        self.assertCountEqual(sample, urls)  # distinct targets
+
+        # only the target failing through working proxies is benched
+        for _ in range(10):
+            target_pool.record(urls[0], True, 50)
+            target_pool.record(urls[1], True, 5000)
+            target_pool.record(urls[2], False)
+            target_pool.record("http://unknown.invalid/", False)
+        self.assertNotIn(urls[2], target_pool.sample(3))
+        self.assertTrue(target_pool.stats()[urls[2]]["benched"])
+        self.assertEqual(target_pool.stats()[urls[0]]["latency_ms"], 50)
+        draws = [target_pool.sample(1)[0] for _ in range(200)]
+        self.assertGreater(draws.count(urls[0]), draws.count(urls[1]))
+
+        # in rotation again after its cooldown, with a clean slate
+        later = time.monotonic() + 61
+        with mock.patch.object(targets.time, "monotonic") as mock_time:
+            mock_time.return_value = later
+            self.assertIn(urls[2], target_pool.sample(3))
+        self.assertEqual(target_pool.stats()[urls[2]]["samples"], 0)
+
+        # probes draw from the pool and report back through working proxies
+        def samples() -> int:
+            return sum(t["samples"] for t in target_pool.stats().values())
+
+        before = samples()
+        with mock.patch.object(targets, "_pool", target_pool):
+            with StubProxyServer() as stub:
+                proxy = {"ip": stub.ip, "port": stub.port}
+                status, _ = asyncio.run(probe.probe(proxy))
+        self.assertTrue(status)
+        self.assertGreaterEqual(samples() - before, 2)  # quorum of 3
+
+    @override_settings(
+        PROXY_TIMEOUT_FACTOR=3,
+        PROXY_CONNECT_TIMEOUT_MIN=1,
+        PROXY_CONNECT_TIMEOUT_MAX=5,
+        PROXY_READ_TIMEOUT_MIN=5,
+        PROXY_READ_TIMEOUT_MAX=30,
+    )
+    def test_timeouts(self) -> None:
+        self.assertEqual(probe.timeouts({}), (5, 30))  # no history
+        self.assertEqual(
+            probe.timeouts({"connect_p95": 100, "latency_p95": 4000}), (1, 12)
+        )
+        self.assertEqual(
+            probe.timeouts(
+                {"connect_p95": 1000, "latency_p95": 4000, "fail_streak": 1}
+            ),
+            (5, 24),
+        )
+        self.assertEqual(probe.split_timeout(3), (3, 3))
+        self.assertEqual(probe.split_timeout((1, 9)), (1, 9))
+
+        # separate budgets; a slow but alive proxy gets its read time
+        with StubProxyServer(delay=0.5) as stub:
+            reply = asyncio.run(
+                probe.request(
+                    stub.ip, stub.port, self.test_urls[0], timeout=(0.1, 2)
+                )
+            )
+            self.assertTrue(reply.ok)
+            with self.assertRaises(asyncio.TimeoutError):
+                asyncio.run(
+                    probe.request(
+                        stub.ip, stub.port, self.test_urls[0], timeout=(2, 0.1)
+                    )
+                )
+
+    def test_read_response(self) -> None:
+        def read(*chunks: bytes) -> bytes:
+            chunks = iter([*chunks, b""])
+            return asyncio.run(
+                probe._read_response(
+                    mock.AsyncMock(side_effect=lambda: next(chunks)), b""
+                )
+            )
+
+        # the whole body, however it is split, up to the length given
+        head = b"HTTP/1.1 200 OK\r\nContent-Length: 7\r\n\r\n"
+        data = read(head + b"{", b'"a"', b":1}", b"more")
+        self.assertEqual(probe._body(data), b'{"a":1}')
+        # chunks decoded
+        head = b"HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n"
+        data = read(head + b'3\r\n{"a', b'\r\n4\r\n":1}\r\n0\r\n\r\n', b"x")
+        self.assertEqual(probe._body(data), b'{"a":1}')
+        # to the end of the connection, at most RESPONSE_LIMIT bytes
+        data = read(b"HTTP/1.0 200 OK\r\n\r\n", b"ab", b"cd")
+        self.assertEqual(probe._body(data), b"abcd")
+        data = read(*[b"x" * 4096] * 20)
+        self.assertEqual(len(data), probe.RESPONSE_LIMIT)
+
+    def test_classify_addresses(self) -> None:
+        real_ip = "10.0.0.1"
+        for value, leaked in (
+            ("10.0.0.1", True),
+            ("192.0.2.1, 10.0.0.1", True),
+            ("for=10.0.0.1:8080;proto=http", True),
+            ('for="[2001:db8::1]:4711"', False),
+            ("10.0.0.12", False),
+            ("110.0.0.1, 10.0.0.10", False),
+        ):
+            judgement = {"ip": "192.0.2.1", "headers": {"Forwarded": value}}
+            self.assertEqual(
+                probe.classify(judgement, real_ip) == Anonymity.TRANSPARENT[0],
+                leaked,
+                value,
+            )
+
+    def test_get_real_ip(self) -> None:
+        probe._real_ips.clear()
+        ok = mock.Mock(**{"json.return_value": {"ip": "203.0.113.7"}})
+        with mock.patch(
+            "scraper.probe.requests.get",
+            side_effect=[requests.ConnectionError(), ok],
+        ) as mock_get:
+            self.assertIsNone(probe.get_real_ip("http://judge/"))
+            # failures are not remembered, successes are
+            self.assertEqual(probe.get_real_ip("http://judge/"), "203.0.113.7")
+            self.assertEqual(probe.get_real_ip("http://judge/"), "203.0.113.7")
+        self.assertEqual(mock_get.call_count, 2)
+
+    def test_probe_status(self) -> None:
+        with StubProxyServer(status=403) as stub:
+            proxy = {"ip": stub.ip, "port": stub.port}
+            status, _ = list(
+                probe.probe_proxies([proxy], test_urls=self.test_urls * 2)
+            )[0]
+            self.assertFalse(status)
+
+    @mock.patch("scraper.check.probe_proxies")
+    def test_check_results(self, mock_probe) -> None:
+        alive = Proxy.objects.create(
+            ip="127.0.0.2", port=8000, country="BD", protocol="HTTP"
+        )
+        dead = Proxy.objects.create(
+            ip="127.0.0.3", port=8000, country="BD", protocol="HTTP"
+        )
+        mock_probe.side_effect = lambda proxies, **kw: (
+            (p["ip"] == alive.ip, p) for p in proxies
+        )
+        check.check()
+        alive.refresh_from_db()
+        dead.refresh_from_db()
+        self.assertIsNotNone(alive.checked_at)
+        self.assertEqual(dead.fail_streak, 1)
+        self.assertTrue(dead.is_suspect)
+        self.assertTrue(Check.objects.get().is_success)
+
+    def test_check_engine_error(self) -> None:
+        Proxy.objects.create(ip="127.0.0.2", port=8000, country="BD")
+        with mock.patch.object(probe, "probe_all") as mock_probe_all:
+            mock_probe_all.side_effect = RuntimeError("engine failed")
+            with self.assertRaisesMessage(RuntimeError, "engine failed"):
+                list(probe.probe_proxies([{"ip": "127.0.0.2", "port": 1}]))
+            obj = check.check()
+        self.assertFalse(obj.is_success)
+        self.assertIn("engine failed", obj.error)
+
+    @override_settings(PROXY_CHECK_SHARD_SIZE=2)
+    @mock.patch("scraper.check.probe_proxies")
+    def test_check_resume(self, mock_probe) -> None:
+        proxies = [
+            Proxy.objects.create(ip=f"127.0.7.{i}", port=80, country="BD")
+            for i in range(5)
+        ]
+        clock = [0.0]
+
+        def probe_until_deadline(batch, deadline=None, **kwargs):
+            for proxy in batch:
+                if proxy["id"] == proxies[3].pk:
+                    clock[0] = deadline  # out of time, no new probes
+                    return
+                yield True, proxy
+
+        mock_probe.side_effect = probe_until_deadline
+        with mock.patch("scraper.check.time") as mock_time:
+            mock_time.monotonic.side_effect = lambda: clock[0]
+            obj = check.check(budget=100)
+            self.assertIsNone(obj.completed_at)
+            self.assertEqual(obj.cursor, proxies[2].pk)
+            self.assertEqual(obj.stats["passed"], 3)
+            self.assertFalse(
+                Proxy.objects.filter(
+                    pk__gt=obj.cursor, checked_at__isnull=False
+                ).exists()
+            )
+
+            clock[0] = 0.0  # next run, resumed from the cursor
+            mock_probe.side_effect = lambda batch, **kw: (
+                (True, p) for p in batch
+            )
+            self.assertEqual(check.check(budget=100), obj)
+            obj.refresh_from_db()
+            self.assertTrue(obj.is_success)
+            self.assertEqual(obj.stats["passed"], 5)
+            self.assertEqual(obj.proxies.count(), 5)
+
+    @override_settings(PROXY_LATENCY_SAMPLES=3)
+    def test_latency_summary(self) -> None:
+        self.assertIsNone(check.percentile([], 50))
+        self.assertEqual(check.percentile([30, 10, 20], 50), 20)
+        self.assertEqual(check.percentile(list(range(1, 101)), 95), 95)
+
+        proxy = Proxy.objects.create(ip="127.0.6.1", port=80, country="BD")
+        results = check.ResultBuffer(size=1)
+        for connect_ms, ttfb_ms in ((5, 100), (6, 400), (7, 200), (8, 300)):
+            proxy.refresh_from_db()
+            results.add(
+                True,
+                {
+                    "id": proxy.pk,
+                    "latency_samples": proxy.latency_samples,
+                    "connect_ms": connect_ms,
+                    "ttfb_ms": ttfb_ms,
+                },
+            )
+        proxy.refresh_from_db()
+        self.assertEqual(len(proxy.latency_samples), 3)  # oldest dropped
+        self.assertEqual(proxy.latency_ms, 300)
+        self.assertEqual(proxy.latency_p50, 300)
+        self.assertEqual(proxy.latency_p95, 400)
+        self.assertEqual(proxy.connect_p95, 8)
+
+    @override_settings(PROXY_DEAD_AFTER=2, PROXY_PURGE_AFTER=3)
+    def test_failure_streak(self) -> None:
+        proxy = Proxy.objects.create(
+            ip="127.0.0.4", port=8000, country="BD", protocol="HTTP"
+        )
+        results = check.ResultBuffer(size=1)
+
+        def fail() -> None:
+            results.add(
+                False, {"id": proxy.pk, "fail_streak": proxy.fail_streak}
+            )
+            proxy.refresh_from_db()
+
+        fail()
+        self.assertTrue(proxy.is_suspect)
+        self.assertFalse(proxy.is_dead)
+        fail()
+        self.assertTrue(proxy.is_dead)
+        self.assertGreater(proxy.next_check_at, timezone.now())
+
+        results.add(True, {"id": proxy.pk, "checked_count": 0})
+        proxy.refresh_from_db()  # revived by a passed check
+        self.assertEqual(proxy.fail_streak, 0)
+        self.assertFalse(proxy.is_dead)
+
+        fail(), fail()
+        with self.assertRaises(Proxy.DoesNotExist):
+            fail()  # purged
+
+    def test_get_due_proxies(self) -> None:
+        now = timezone.now()
+        new = Proxy.objects.create(ip="127.0.2.1", port=80, country="BD")
+        due = Proxy.objects.create(
+            ip="127.0.2.2", port=80, country="BD", next_check_at=now
+        )
+        later = Proxy.objects.create(
+            ip="127.0.2.3",
+            port=80,
+            country="BD",
+            next_check_at=now + timedelta(hours=1),
+        )
+        proxies = list(utils.get_due_proxies(now))
+        self.assertListEqual(proxies, [new, due])
+        self.assertNotIn(later, proxies)
+
+    def test_recheck_interval(self) -> None:
+        self.assertEqual(
+            check.recheck_interval(0),
+            timedelta(seconds=settings.PROXY_RECHECK_MIN_INTERVAL),
+        )
+        self.assertEqual(
+            check.recheck_interval(1), 2 * check.recheck_interval(0)
+        )
+        self.assertEqual(
+            check.recheck_interval(1000),
+            timedelta(seconds=settings.PROXY_RECHECK_MAX_INTERVAL),
+        )
+
+    def test_pool(self) -> None:
+        cache.delete(pool.POOL_KEY)
+        now = timezone.now()
+        overdue = now - timedelta(seconds=settings.PROXY_POOL_MAX_AGE + 1)
+        fresh, stale, transparent = (
+            Proxy.objects.create(
+                ip=f"127.0.8.{i}",
+                port=80,
+                country="BD",
+                anonymity=anonymity,
+                checked_at=now,
+                next_check_at=next_check_at,
+            )
+            for i, (anonymity, next_check_at) in enumerate(
+                (
+                    (Anonymity.ANONYMOUS[0], now + timedelta(minutes=15)),
+                    (Anonymity.ELITE[0], overdue),
+                    (Anonymity.TRANSPARENT[0], now + timedelta(minutes=15)),
+                )
+            )
+        )
+        with self.assertNumQueries(1):  # rebuilt when missing
+            self.assertEqual(pool.pick()["id"], fresh.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(pool.pick(country="BD")["id"], fresh.pk)
+            self.assertIsNone(pool.pick(protocol="SOCKS5"))
+
+        # the checker evicts failing proxies as it writes the results back
+        results = check.ResultBuffer(size=1)
+        results.add(False, {"id": fresh.pk})
+        self.assertIsNone(pool.pick())
+        results.add(True, {"id": stale.pk, "anonymity": None})
+        self.assertEqual(pool.pick()["id"], stale.pk)
+
+        # passed long ago, but rechecked that much less often
+        reliable = Proxy.objects.create(
+            ip="127.0.8.9",
+            port=80,
+            country="BD",
+            anonymity=Anonymity.ELITE[0],
+            checked_count=10,
+            checked_at=now - timedelta(hours=12),
+            next_check_at=now + timedelta(hours=12),
+        )
+        self.assertEqual(
+            now + check.recheck_interval(reliable.checked_count),
+            now + timedelta(seconds=settings.PROXY_RECHECK_MAX_INTERVAL),
+        )
+        pool.refresh()
+        self.assertEqual(
+            {p["id"] for p in pool.get_pool()}, {stale.pk, reliable.pk}
+        )
+
+        # leased proxies are not served, whether the pool knows of it or not
+        leased = leases.lease()
+        self.assertEqual(len(pool.get_pool()), 1)
+        for _ in range(10):
+            self.assertNotEqual(pool.pick()["id"], leased["id"])
+        pool.refresh()
+        self.assertEqual(len(pool.get_pool()), 2)  # the lease still runs
+        self.assertEqual(len(pool.get_matching()), 1)
+        leases.release(leased["lease"])
+        pool.refresh()
+        self.assertEqual(len(pool.pick_many(2)), 2)
+
+    @override_settings(PROXY_POOL_SIZE=2)
+    def test_pool_filtered_beyond(self) -> None:
+        cache.delete(pool.POOL_KEY)
+        now = timezone.now()
+        for i, (country, score) in enumerate(
+            (("BD", 0.9), ("BD", 0.8), ("US", 0.2), ("US", 0.1), ("US", 0))
+        ):
+            Proxy.objects.create(
+                ip=f"127.0.9.{i}",
+                port=80,
+                country=country,
+                anonymity=Anonymity.ELITE[0],
+                score=score,
+                checked_at=now,
+                next_check_at=now + timedelta(minutes=15),
+            )
+        self.assertEqual(len(pool.get_pool()), 2)
+        self.assertEqual(pool.pick(country="US")["ip"], "127.0.9.2")
+        self.assertListEqual(
+            sorted(p["ip"] for p in pool.pick_many(2, country="US")),
+            ["127.0.9.2", "127.0.9.3"],
+        )
+        self.assertListEqual(pool.pick_many(2, country="XX"), [])
+        # filled up from the pool first
+        self.assertEqual(len(pool.pick_many(3, country="BD")), 2)
+        with self.assertNumQueries(0):
+            self.assertEqual(len(pool.pick_many(2, country="BD")), 2)
+
+    def test_leases(self) -> None:
+        proxies = [
+            Proxy.objects.create(
+                ip=f"127.0.3.{i}",
+                port=8080,
+                country="BD",
+                protocol="HTTP",
+                anonymity=Anonymity.ELITE[0],
+                checked_at=timezone.now(),
+                next_check_at=timezone.now() + timedelta(hours=1),
+            )
+            for i in range(3)
+        ]
+        # select and conditional claim, in a transaction
+        with self.assertNumQueries(4):
+            first = leases.lease(ttl=60)
+        others = [leases.lease(ttl=60), leases.lease(ttl=60)]
+        self.assertEqual(
+            {first["id"], *(p["id"] for p in others)}, {p.pk for p in proxies}
+        )
+        self.assertIsNone(leases.lease())  # no sharing while leased
+
+        # released proxies go back to the pool, least recently leased first
+        self.assertTrue(leases.release(first["lease"]))
+        self.assertFalse(leases.release(first["lease"]))
+        self.assertEqual(leases.lease()["id"], first["id"])
+        self.assertIsNone(leases.renew(first["lease"]))
+
+        # expired leases are reclaimed, whether swept yet or not
+        until = leases.renew(others[0]["lease"], ttl=120)
+        self.assertGreater(until, others[1]["leased_until"])
+        Proxy.objects.filter(pk=others[1]["id"]).update(
+            leased_until=timezone.now() - timedelta(seconds=1)
+        )
+        self.assertEqual(leases.lease(country="BD")["id"], others[1]["id"])
+        Proxy.objects.update(leased_until=timezone.now())
+        self.assertEqual(leases.sweep(), 3)
+        self.assertFalse(
+            Proxy.objects.filter(lease_token__isnull=False).exists()
+        )
+        self.assertIsNone(leases.lease(protocol="SOCKS5"))
+        with override_settings(PROXY_LEASE_MAX_TTL=10):
+            self.assertEqual(leases.get_ttl(60), timedelta(seconds=10))
+
+    def test_result_buffer(self) -> None:
+        proxies = [
+            Proxy.objects.create(
+                ip=f"127.0.1.{i}", port=8000, country="BD", protocol="HTTP"
+            )
+            for i in range(6)
+        ]
+        results = check.ResultBuffer(size=4, interval=60)
+        with self.assertNumQueries(0):
+            for p in proxies[:3]:
+                results.add(p.port == 8000, {"id": p.pk})
+        # 4th result fills the buffer: one update for each outcome, one for
+        # the scores and the warm pool rebuild
+        with self.assertNumQueries(4):
+            results.add(False, {"id": proxies[3].pk})
+        self.assertEqual(len(results), 0)
+        self.assertEqual(
+            Proxy.objects.filter(
+                checked_at__isnull=False,
+                checked_count=1,
+                next_check_at__gt=timezone.now(),
+            ).count(),
+            3,
+        )
+        self.assertTrue(Proxy.objects.get(pk=proxies[3].pk).is_suspect)
+
+    def test_scoring(self) -> None:
+        fast = scoring.score(10, 0, 200, 400, Anonymity.ELITE[0])
+        slow = scoring.score(10, 0, 2000, 8000, Anonymity.ELITE[0])
+        flaky = scoring.score(10, 10, 200, 400, Anonymity.ELITE[0])
+        self.assertGreater(fast, slow)
+        self.assertGreater(fast, flaky)
+        self.assertEqual(
+            scoring.score(10, 1, 200, 400, Anonymity.ELITE[0], fail_streak=1),
+            round(scoring.score(10, 1, 200, 400, Anonymity.ELITE[0]) / 2, 2),
+        )
+        self.assertLessEqual(scoring.score(10**6, 0, 0, 0, "ELI"), 100)
+
+        # the higher scored, the likelier to come first
+        firsts = Counter(
+            scoring.weighted_shuffle(["a", "b", "c"], [90, 9, 0])[0]
+            for _ in range(1000)
+        )
+        self.assertGreater(firsts["a"], firsts["b"])
+        self.assertGreater(firsts["b"], firsts["c"])
+        self.assertEqual(
+            sorted(scoring.weighted_shuffle([1, 2, 3], [0, 0, 0])), [1, 2, 3]
+        )
+
+        # the checker rescores proxies with every result
+        proxy = Proxy.objects.create(ip="127.0.2.1", port=8000, country="BD")
+        results = check.ResultBuffer(size=1)
+        results.add(True, {"id": proxy.pk, "connect_ms": 20, "ttfb_ms": 90})
+        proxy.refresh_from_db()
+        self.assertGreater(proxy.score, 0)
+        passed = proxy.score
+        results.add(False, {"id": proxy.pk, "checked_count": 1})
+        proxy.refresh_from_db()
+        self.assertEqual(proxy.failed_count, 1)
+        self.assertLess(proxy.score, passed)
+
+
+class JudgeTestCase(LiveServerTestCase):
+    real_ip = "203.0.113.7"  # pretend public ip of the checker
+
+    def setUp(self) -> None:
+        probe._real_ips.clear()
+        self.judge_url = self.live_server_url + reverse("scraper:judge")
+
+    def judge(self, headers: dict) -> tuple[bool, dict]:
+        with StubProxyServer(
+            handler=ForwardingProxyHandler, headers=headers
+        ) as stub:
+            proxy = {"ip": stub.ip, "port": stub.port, "anonymity": "UNK"}
+            with override_settings(PROXY_REAL_IP=self.real_ip):
+                return list(
+                    probe.probe_proxies([proxy], judge_url=self.judge_url)
+                )[0]
+
+    def test_judge_view(self) -> None:
+        res = Client().get(self.judge_url, HTTP_VIA="1.1 test")
+        self.assertEqual(res.status_code, HTTPStatus.OK)
+        self.assertEqual(res.json()["headers"]["Via"], "1.1 test")
+        self.assertIn("ip", res.json())
+
+    def test_classify(self) -> None:
+        status, proxy = self.judge({"X-Forwarded-For": self.real_ip})
+        self.assertTrue(status)
+        self.assertEqual(proxy["anonymity"], Anonymity.TRANSPARENT[0])
+
+        status, proxy = self.judge({"Via": "1.1 stub"})
+        self.assertEqual(proxy["anonymity"], Anonymity.ANONYMOUS[0])
+
+        status, proxy = self.judge({})
+        self.assertEqual(proxy["anonymity"], Anonymity.ELITE[0])
+
+    def test_judged_write_back(self) -> None:
+        obj = Proxy.objects.create(
+            ip="127.0.5.1", port=80, country="BD", anonymity="UNK"
+        )
+        results = check.ResultBuffer(size=1)
+        results.add(True, {"id": obj.pk, "anonymity": Anonymity.ELITE[0]})
+        obj.refresh_from_db()
+        self.assertEqual(obj.anonymity, Anonymity.ELITE[0])
+
+
 class ScrapersTestCase(TestCase):
     def test_sslp(self) -> None:
         soup = BeautifulSoup(sslp.content, "html.parser")
@@ -381,6 +1400,7 @@ class APIViewTests(TestCase):
     def setUp(self) -> None:
         self.testuser = USER_MODEL.objects.get(username="testuser")
         self.client = Client()
+        cache.clear()  # responses cached by other tests
 
     def test_anonymous_view(self) -> None:
         self.client.logout()  # sanity check
@@ -410,23 +1430,200 @@ class APIViewTests(TestCase):
             self.assertEqual(response.status_code, HTTPStatus.OK)  # 200
             self.assertTrue(mock_check.called)  # called once
 
+    def test_proxy_latency_filter(self) -> None:
+        self.client.force_login(self.testuser)
+        fast = Proxy.objects.create(
+            ip="127.0.6.2", port=80, country="BD", latency_p95=100
+        )
+        slow = Proxy.objects.create(
+            ip="127.0.6.3", port=80, country="BD", latency_p95=900
+        )
+        url = reverse("scraper:proxy-list")
+        res = self.client.get(url, {"latency_p95__lte": 500})
+        ids = [p["id"] for p in res.json()["results"]]
+        self.assertListEqual(ids, [fast.pk])
+
+        res = self.client.get(url, {"ordering": "latency_p95"})
+        ids = [p["id"] for p in res.json()["results"]]
+        self.assertListEqual(ids, [fast.pk, slow.pk])
+        res = self.client.get(url, {"ordering": "-latency_p95"})
+        ids = [p["id"] for p in res.json()["results"]]
+        self.assertListEqual(ids, [slow.pk, fast.pk])
+
+    def test_api_query_budgets(self) -> None:
+        """Queries of the read endpoints do not grow with the number of rows"""
+        self.client.force_login(self.testuser)
+        site = Website.objects.create(name="Budget", code="BDG", url="x.y")
+
+        def count_queries(name: str) -> int:
+            cache.clear()  # no cached response
+            with CaptureQueriesContext(connection) as queries:
+                res = self.client.get(reverse(f"scraper:{name}-list"))
+            self.assertEqual(res.status_code, HTTPStatus.OK)
+            return len(queries)
+
+        for n in (1, 10):
+            for i in range(n):
+                Page.objects.create(site=site, path=f"/{n}/{i}")
+                Proxy.objects.create(
+                    ip=f"127.{n}.10.{i}", port=80, country="BD"
+                )
+                Scrape.objects.create().sites.add(site)
+                Check.objects.create()
+            budgets = {
+                name: count_queries(name)
+                for name in ("website", "page", "proxy", "scrape", "check")
+            }
+            if n == 1:
+                first = budgets
+        self.assertDictEqual(budgets, first)
+
+    def test_response_cache(self) -> None:
+        self.client.force_login(self.testuser)
+        url = reverse("scraper:proxy-list")
+        proxy = Proxy.objects.create(ip="127.0.8.1", port=80, country="BD")
+
+        # not cached in a per-process cache, bumps by workers never arrive
+        self.assertFalse(cache_utils.is_shared())
+        with self.assertNumQueries(3):
+            res = self.client.get(url, {"country": "BD"})
+        # leases change too often to be served from the cache
+        self.assertNotIn("leased_until", res.json()["results"][0])
+        self.assertEqual(len(cache_utils.check_cache()), 1)
+        with tempfile.TemporaryDirectory() as location, override_settings(
+            CACHES={
+                "default": {
+                    "BACKEND": "django.core.cache.backends.filebased."
+                    "FileBasedCache",
+                    "LOCATION": location,
+                }
+            }
+        ):
+            self.assertListEqual(cache_utils.check_cache(), [])
+            self.assert_response_cache(url, proxy)
+
+    def assert_response_cache(self, url: str, proxy: Proxy) -> None:
+        self.client.get(url, {"country": "BD"})
+        with self.assertNumQueries(2):  # session and user, not the proxies
+            res = self.client.get(url, {"country": "BD"})
+        self.assertEqual(res.json()["results"][0]["id"], proxy.pk)
+        self.client.get(reverse("scraper:proxy-detail", args=[proxy.pk]))
+        with self.assertNumQueries(2):
+            self.client.get(reverse("scraper:proxy-detail", args=[proxy.pk]))
+
+        # stale until the data version is bumped
+        Proxy.objects.filter(pk=proxy.pk).update(port=81)
+        res = self.client.get(url, {"country": "BD"})
+        self.assertEqual(res.json()["results"][0]["port"], 80)
+        check.complete(Check.objects.create(), [])
+        res = self.client.get(url, {"country": "BD"})
+        self.assertEqual(res.json()["results"][0]["port"], 81)
+
+        # and by writes through the API
+        self.client.patch(
+            reverse("scraper:proxy-detail", args=[proxy.pk]),
+            {"port": 82},
+            content_type="application/json",
+        )
+        res = self.client.get(url, {"country": "BD"})
+        self.assertEqual(res.json()["results"][0]["port"], 82)
+        cache.delete(cache_utils.DATA_VERSION_KEY)  # evicted
+        cache_utils.bump_data_version()
+        self.assertIsNotNone(cache.get(cache_utils.DATA_VERSION_KEY))
+
+    def test_keyset_pagination(self) -> None:
+        self.client.force_login(self.testuser)
+        Proxy.objects.all().delete()
+        created = [
+            Proxy.objects.create(ip=f"127.0.7.{i}", port=80, country="BD")
+            for i in range(5)
+        ]
+        url = reverse("scraper:proxy-list")
+        res = self.client.get(url, {"page_size": 2})
+        self.assertNotIn("count", res.json())
+        ids = [p["id"] for p in res.json()["results"]]
+        while res.json()["next"]:
+            # a page, the session and the user, never a count
+            with self.assertNumQueries(3):
+                res = self.client.get(res.json()["next"])
+            ids += [p["id"] for p in res.json()["results"]]
+        self.assertListEqual(ids, [p.pk for p in reversed(created)])
+
+        # every allowed ordering walks all rows, some latencies unknown
+        ProxyViewSet = resolve(url).func.cls
+        Proxy.objects.filter(pk__in=[p.pk for p in created[::2]]).update(
+            latency_p50=100
+        )
+        for name in ("proxy", "scrape", "check"):
+            view = resolve(reverse(f"scraper:{name}-list")).func.cls
+            for field in view.ordering_fields:
+                for ordering in (field, f"-{field}"):
+                    res = self.client.get(
+                        reverse(f"scraper:{name}-list"),
+                        {"ordering": ordering, "page_size": 2},
+                    )
+                    rows = res.json()["results"]
+                    while res.json()["next"]:
+                        res = self.client.get(res.json()["next"])
+                        self.assertEqual(res.status_code, HTTPStatus.OK)
+                        rows += res.json()["results"]
+                    self.assertEqual(
+                        len({r["id"] for r in rows}),
+                        view.queryset.model.objects.count(),
+                    )
+        self.assertGreater(len(ProxyViewSet.ordering_fields), 1)
+        # paged by number where the cursor cannot be keyed on the field
+        res = self.client.get(url, {"ordering": "latency_p50"})
+        self.assertEqual(res.json()["count"], 5)
+        res = self.client.get(url, {"ordering": "-id"})
+        self.assertNotIn("count", res.json())
+
+        res = self.client.get(url, {"count": "estimate", "is_dead": False})
+        self.assertEqual(res.json()["estimated_count"], 5)  # exact on sqlite
+
+        Check.objects.create(stats={"passed": 1})
+        Scrape.objects.create(proxies=2)
+        res = self.client.get(reverse("scraper:check-list"))
+        self.assertEqual(res.json()["results"][0]["stats"], {"passed": 1})
+        self.assertNotIn("proxies", res.json()["results"][0])
+        res = self.client.get(reverse("scraper:scrape-list"))
+        self.assertEqual(res.json()["results"][0]["proxies"], 2)
+        res = self.client.post(reverse("scraper:scrape-list"))
+        self.assertEqual(res.status_code, HTTPStatus.METHOD_NOT_ALLOWED)
+
     @mock.patch.object(scraper.views, "get_random_working_proxy")
     def test_get_proxy_api(self, mock_result) -> None:
         self.client.force_login(self.testuser)
         get_proxy_url = reverse("scraper:get_proxy")
 
-        # get method
-        mock_result.return_value = None
+        # get method, served from the warm pool without probing
+        pool.refresh()
         res = self.client.get(get_proxy_url)
         self.assertEqual(res.status_code, HTTPStatus.NO_CONTENT)
-        mock_result.return_value = {"ip": "127.1.2.3", "port": 45678}
-        res = self.client.get(get_proxy_url)
+        Proxy.objects.create(
+            ip="127.1.2.3",
+            port=45678,
+            country="BD",
+            protocol="HTTP",
+            anonymity=Anonymity.ELITE[0],
+            checked_at=timezone.now(),
+            next_check_at=timezone.now() + timedelta(hours=1),
+        )
+        pool.refresh()
+        with self.assertNumQueries(2):  # session and user, not proxies
+            res = self.client.get(get_proxy_url)
         self.assertEqual(res.status_code, HTTPStatus.OK)
-        self.assertIn("result", res.json())
+        self.assertDictEqual(
+            res.json()["result"],
+            {"ip": "127.1.2.3", "port": 45678, "protocol": "HTTP"},
+        )
+        self.assertFalse(mock_result.called)
 
         # post method
         res = self.client.post(get_proxy_url)
         self.assertEqual(res.status_code, HTTPStatus.BAD_REQUEST)  # 400
+        res = self.client.post(get_proxy_url, {"test_urls": "google.com/"})
+        self.assertEqual(res.status_code, HTTPStatus.BAD_REQUEST)  # no host
         mock_result.return_value = None
         res = self.client.post(
             get_proxy_url, {"test_urls": "https://google.com/"}
@@ -438,3 +1635,259 @@ class APIViewTests(TestCase):
         )
         self.assertEqual(res.status_code, HTTPStatus.OK)
         self.assertIn("result", res.json())
+
+    def test_lease_api(self) -> None:
+        self.client.force_login(self.testuser)
+        Proxy.objects.create(
+            ip="127.1.4.1",
+            port=8080,
+            country="BD",
+            protocol="HTTP",
+            anonymity=Anonymity.ELITE[0],
+            checked_at=timezone.now(),
+            next_check_at=timezone.now() + timedelta(hours=1),
+        )
+        url = reverse("scraper:lease")
+        res = self.client.post(url, {"ttl": 60, "country": "bd"})
+        self.assertEqual(res.status_code, HTTPStatus.OK)
+        result = res.json()["result"]
+        self.assertEqual((result["ip"], result["port"]), ("127.1.4.1", 8080))
+        res = self.client.post(url)
+        self.assertEqual(res.status_code, HTTPStatus.NO_CONTENT)
+        res = self.client.post(url, {"ttl": "x"})
+        self.assertEqual(res.status_code, HTTPStatus.BAD_REQUEST)
+        for data in (
+            {"country": 1},
+            {"protocol": ["HTTP"]},
+            {"max_latency": [100]},
+            {"ttl": [1]},
+        ):
+            res = self.client.post(url, data, content_type="application/json")
+            self.assertEqual(res.status_code, HTTPStatus.BAD_REQUEST, data)
+
+        detail_url = reverse("scraper:lease_detail", args=[result["lease"]])
+        res = self.client.put(
+            detail_url, {"ttl": 120}, content_type="application/json"
+        )
+        self.assertEqual(res.status_code, HTTPStatus.OK)
+        self.assertGreater(
+            res.json()["result"]["leased_until"], result["leased_until"]
+        )
+        res = self.client.delete(detail_url)
+        self.assertEqual(res.status_code, HTTPStatus.NO_CONTENT)
+        res = self.client.delete(detail_url)
+        self.assertEqual(res.status_code, HTTPStatus.NOT_FOUND)
+        res = self.client.put(detail_url)
+        self.assertEqual(res.status_code, HTTPStatus.NOT_FOUND)
+        self.assertEqual(self.client.post(url).status_code, HTTPStatus.OK)
+
+    def test_export_api(self) -> None:
+        self.client.force_login(self.testuser)
+        Proxy.objects.all().delete()
+        for i in range(3):
+            proxy = Proxy.objects.create(
+                ip=f"127.1.5.{i}",
+                port=8080,
+                country="BD",
+                protocol="HTTP",
+                latency_p95=100 * i,
+            )
+        Proxy.objects.create(ip="127.1.5.9", port=80, country="BD", is_dead=1)
+        url = reverse("scraper:export", args=["txt"])
+
+        res = self.client.get(url)
+        self.assertEqual(res.status_code, HTTPStatus.OK)
+        self.assertTrue(res.streaming)
+        self.assertEqual(
+            b"".join(res.streaming_content).decode(),
+            "127.1.5.0:8080\n127.1.5.1:8080\n127.1.5.2:8080\n",
+        )
+        res = self.client.get(reverse("scraper:export", args=["csv"]))
+        lines = b"".join(res.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0].split(",")[:2], ["ip", "port"])
+        self.assertEqual(len(lines), 4)
+        res = self.client.get(
+            reverse("scraper:export", args=["jsonl"]), {"max_latency": 100}
+        )
+        lines = b"".join(res.streaming_content).decode().splitlines()
+        self.assertListEqual(
+            [json.loads(line)["latency_p95"] for line in lines], [0, 100]
+        )
+        res = self.client.get(reverse("scraper:export", args=["xml"]))
+        self.assertEqual(res.status_code, HTTPStatus.NOT_FOUND)
+
+        # whatever the client accepts, ie. the media type of the format
+        for accept in ("text/csv", "text/plain", "application/x-ndjson"):
+            res = self.client.get(url, HTTP_ACCEPT=accept)
+            self.assertEqual(res.status_code, HTTPStatus.OK)
+            self.assertEqual(res["Content-Type"], "text/plain")
+        res = self.client.get(
+            reverse("scraper:export", args=["csv"]), HTTP_ACCEPT="text/csv"
+        )
+        self.assertEqual(res["Content-Type"], "text/csv")
+        res = self.client.get(
+            reverse("scraper:export", args=["xml"]), HTTP_ACCEPT="text/csv"
+        )
+        self.assertEqual(res.status_code, HTTPStatus.NOT_FOUND)
+        self.assertIn("Format must be", res.json()["detail"])
+
+        # gzipped on request
+        res = self.client.get(url, HTTP_ACCEPT_ENCODING="gzip, deflate")
+        self.assertEqual(res["Content-Encoding"], "gzip")
+        self.assertEqual(
+            gzip.decompress(b"".join(res.streaming_content)).count(b"\n"), 3
+        )
+
+        for accept, gzipped in (
+            ("gzip;q=0, deflate", False),
+            ("deflate, *", True),
+            ("*;q=0, GZIP;q=0.5", True),
+            ("*;q=0", False),
+        ):
+            res = self.client.get(url, HTTP_ACCEPT_ENCODING=accept)
+            self.assertEqual(res.has_header("Content-Encoding"), gzipped)
+
+        # unchanged until the next check or scrape completes, or a proxy
+        # is added or written through the API
+        for change in (
+            lambda: Check.objects.create(completed_at=timezone.now()),
+            lambda: Proxy.objects.create(ip="127.1.5.8", port=80),
+            lambda: self.client.patch(
+                reverse("scraper:proxy-detail", args=[proxy.pk]),
+                {"port": 8081},
+                content_type="application/json",
+            ),
+        ):
+            etag = self.client.get(url)["ETag"]
+            res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(res.status_code, HTTPStatus.NOT_MODIFIED)
+            change()
+            res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(res.status_code, HTTPStatus.OK)
+            self.assertNotEqual(res["ETag"], etag)
+
+    @mock.patch("scraper.async_views.probe", new_callable=mock.AsyncMock)
+    def test_async_views(self, mock_probe) -> None:
+        cache.clear()
+        url = reverse("scraper:get_proxy_async")
+        res = self.client.get(url)
+        self.assertEqual(res.status_code, HTTPStatus.UNAUTHORIZED)
+        self.assertIn("WWW-Authenticate", res)
+        self.client.force_login(self.testuser)
+        self.assertEqual(
+            self.client.put(url).status_code, HTTPStatus.METHOD_NOT_ALLOWED
+        )
+
+        # the permissions and throttles of the sync view apply
+        class Deny(throttling.BaseThrottle):
+            def allow_request(self, request, view) -> bool:
+                return False
+
+        for attr, value, status in (
+            ("permission_classes", [permissions.IsAdminUser], "FORBIDDEN"),
+            ("throttle_classes", [Deny], "TOO_MANY_REQUESTS"),
+        ):
+            with mock.patch.object(scraper.views.GetProxyAPI, attr, value):
+                res = self.client.get(url)
+            self.assertEqual(res.status_code, HTTPStatus[status])
+        self.assertEqual(
+            self.client.get(url).status_code, HTTPStatus.NO_CONTENT
+        )
+
+        proxy = Proxy.objects.create(
+            ip="127.1.6.1",
+            port=8080,
+            country="BD",
+            protocol="HTTP",
+            anonymity=Anonymity.ELITE[0],
+            checked_at=timezone.now(),
+            next_check_at=timezone.now() + timedelta(hours=1),
+        )
+        pool.refresh()
+        res = self.client.get(url, {"country": "BD"})
+        self.assertEqual(res.json()["result"]["ip"], proxy.ip)
+        res = self.client.get(url, {"count": 5})
+        self.assertEqual(res.json()["count"], 1)
+        res = self.client.get(url, {"count": 0})
+        self.assertEqual(res.status_code, HTTPStatus.BAD_REQUEST)
+
+        # live tests on the asyncio engine, then answered from the cache
+        res = self.client.post(url)
+        self.assertEqual(res.status_code, HTTPStatus.BAD_REQUEST)
+        res = self.client.post(url, {"test_urls": "/relative"})
+        self.assertEqual(res.status_code, HTTPStatus.BAD_REQUEST)
+        mock_probe.return_value = False, {}
+        res = self.client.post(url, {"test_urls": "https://example.com/"})
+        self.assertEqual(res.status_code, HTTPStatus.NO_CONTENT)
+        cache.clear()
+        mock_probe.return_value = True, {}
+        for _ in range(2):
+            res = self.client.post(url, {"test_urls": "https://example.com/"})
+            self.assertEqual(res.status_code, HTTPStatus.OK)
+            self.assertEqual(res.json()["result"]["port"], proxy.port)
+        self.assertEqual(mock_probe.await_count, 2)
+
+        url = reverse("scraper:lease_async")
+        res = self.client.post(url, {"ttl": 60})
+        self.assertEqual(res.status_code, HTTPStatus.OK)
+        self.assertIn("lease", res.json()["result"])
+        self.assertEqual(
+            self.client.post(url).status_code, HTTPStatus.NO_CONTENT
+        )
+        for data in ({"country": 1}, {"ttl": [1]}):
+            res = self.client.post(url, data, content_type="application/json")
+            self.assertEqual(res.status_code, HTTPStatus.BAD_REQUEST, data)
+
+    def test_get_proxy_batch_api(self) -> None:
+        self.client.force_login(self.testuser)
+        url = reverse("scraper:get_proxy")
+        for i, (country, protocol, latency) in enumerate(
+            [
+                ("BD", "HTTP", 100),
+                ("BD", "HTTP", 900),
+                ("BD", "SOCKS5", 100),
+                ("US", "HTTP", 100),
+            ]
+        ):
+            Proxy.objects.create(
+                ip=f"127.1.3.{i}",
+                port=8080,
+                country=country,
+                protocol=protocol,
+                anonymity=Anonymity.ELITE[0],
+                checked_at=timezone.now(),
+                next_check_at=timezone.now() + timedelta(hours=1),
+                latency_p95=latency,
+            )
+        pool.refresh()
+
+        with self.assertNumQueries(2):  # session and user, not proxies
+            res = self.client.get(url, {"count": 10})
+        self.assertEqual(res.status_code, HTTPStatus.OK)
+        self.assertEqual(res.json()["count"], 4)
+        results = res.json()["results"]
+        self.assertEqual(len({(p["ip"], p["port"]) for p in results}), 4)
+        self.assertEqual(self.client.get(url, {"count": 2}).data["count"], 2)
+
+        res = self.client.get(
+            url,
+            {"count": 10, "country": "bd", "protocol": "http"},
+        )
+        self.assertEqual(res.json()["count"], 2)
+        res = self.client.get(
+            url, {"count": 10, "country": "BD", "max_latency": 500}
+        )
+        self.assertSetEqual(
+            {p["protocol"] for p in res.json()["results"]}, {"HTTP", "SOCKS5"}
+        )
+        res = self.client.get(url, {"protocol": "SOCKS5"})
+        self.assertEqual(res.json()["result"]["protocol"], "SOCKS5")
+
+        res = self.client.get(url, {"count": 10, "country": "FR"})
+        self.assertEqual(res.status_code, HTTPStatus.NO_CONTENT)
+        for params in ({"count": 0}, {"count": "x"}, {"max_latency": "x"}):
+            res = self.client.get(url, params)
+            self.assertEqual(res.status_code, HTTPStatus.BAD_REQUEST)
+        with override_settings(PROXY_BATCH_MAX=3):
+            res = self.client.get(url, {"count": 4})
+            self.assertEqual(res.status_code, HTTPStatus.BAD_REQUEST)
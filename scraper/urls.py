@@ -1,7 +1,7 @@
 from django.urls import path, include
 from rest_framework import routers
 
-from scraper import views
+from scraper import async_views, views
 
 app_name = "scraper"
 
@@ -9,6 +9,8 @@ router = routers.DefaultRouter()
 router.register("sites", views.WebsiteViewSet)
 router.register("pages", views.PageViewSet)
 router.register("proxies", views.ProxyViewSet)
+router.register("scrapes", views.ScrapeViewSet)
+router.register("checks", views.CheckViewSet)
 
 urlpatterns = [
     # router urls
@@ -18,4 +20,19 @@ urlpatterns = [
         "check_proxies/", views.CheckProxiesAPI.as_view(), name="check_proxies"
     ),
     path("get_proxy/", views.GetProxyAPI.as_view(), name="get_proxy"),
+    path("lease/", views.LeaseProxyAPI.as_view(), name="lease"),
+    path(
+        "lease/<uuid:token>/",
+        views.LeaseDetailAPI.as_view(),
+        name="lease_detail",
+    ),
+    path(
+        "export/proxies.<str:ext>",
+        views.ExportProxiesAPI.as_view(),
+        name="export",
+    ),
+    path("judge/", views.JudgeAPI.as_view(), name="judge"),
+    # async views, served without blocking by the ASGI app
+    path("async/get_proxy/", async_views.get_proxy, name="get_proxy_async"),
+    path("async/lease/", async_views.lease, name="lease_async"),
 ]
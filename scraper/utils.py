@@ -1,26 +1,61 @@
+import asyncio
 import concurrent.futures
+import itertools
+import math
 import random
+import threading
 import typing
 from concurrent.futures import ThreadPoolExecutor
-from datetime import timedelta
+from datetime import datetime, timedelta
 from logging import getLogger
 
 import requests
 import requests_cache
 from bs4 import BeautifulSoup
-from django.db.models import QuerySet
+from django.conf import settings
+from django.db.models import Count, F, Max, Min, Q, QuerySet
 from django.utils import timezone
 from requests import Response
+from requests.adapters import HTTPAdapter
+from requests_cache.patcher import OriginalSession
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options as ChromeOptions
 from webdriver_manager.chrome import ChromeDriverManager
 
-from project.test_urls import TEST_URLS
 from project.user_agents import USER_AGENTS
-from scraper.models import Website, Page, Proxy, Anonymity
+from scraper import targets, verdicts
+from scraper.models import Website, Page, Proxy, Anonymity, Protocol
+from scraper.scoring import weighted_choice, weighted_shuffle
+from scraper.probe import (
+    SOCKS_PROTOCOLS,
+    probe,
+    probe_proxies,
+    quorum,
+    timeouts,
+)
 
 logger = getLogger(__name__)
 
+HTTP_PROTOCOLS = (Protocol.HTTP[0], Protocol.HTTPS[0])
+HTTP_POOL_CONNECTIONS = 100  # proxies/hosts kept connected per session
+HTTP_POOL_MAXSIZE = 10  # connections kept alive per proxy/host
+# threads fetching test URLs, a session each, enough for every URL of all
+# the tests at once, as fetches running past their verdict are not cancelled
+HTTP_FETCH_WORKERS = max(
+    50, settings.PROXY_TEST_WORKERS * settings.PROXY_TEST_URLS_PER_PROBE
+)
+SAMPLE_SLICE = 5  # consecutive proxies drawn from each random pivot
+SAMPLE_SHUFFLE_MAX = 1000  # candidates few enough to shuffle in the db
+_sessions = threading.local()
+# long-lived, so the sessions of its threads keep their connections
+_fetches = ThreadPoolExecutor(
+    max_workers=HTTP_FETCH_WORKERS, thread_name_prefix="fetch"
+)
+# proxies tested at once by all requests, PROXY_TEST_PARALLEL each at most
+_tests = ThreadPoolExecutor(
+    max_workers=settings.PROXY_TEST_WORKERS, thread_name_prefix="test"
+)
+
 
 def get_sites(is_active=True, **kwargs) -> QuerySet[Website]:
     """Returns active <Website> queryset
@@ -90,10 +125,174 @@ def get_proxies(is_active: bool = True, **kwargs) -> QuerySet[Proxy]:
     return Proxy.objects.filter(**params)
 
 
+def get_due_proxies(now: datetime = None, **kwargs) -> QuerySet[Proxy]:
+    """Returns active proxies whose next check is due, most overdue first
+    Args:
+        now[datetime]: point in time to compare `next_check_at` against
+        kwargs[dict]: keyword arguments passed to <Proxy> objects filter
+    Returns:
+        QuerySet[Proxy]
+    """
+    now = now or timezone.now()
+    return (
+        get_proxies(**kwargs)
+        .filter(Q(next_check_at__isnull=True) | Q(next_check_at__lte=now))
+        .order_by(F("next_check_at").asc(nulls_first=True))
+    )
+
+
+def _slice(proxies: QuerySet[Proxy], pivot: int, size: int) -> list[Proxy]:
+    """Up to `size` proxies from the pivot on, wrapping around to the start"""
+    sample = list(proxies.filter(id__gte=pivot).order_by("id")[:size])
+    if len(sample) < size:
+        sample += proxies.filter(id__lt=pivot).order_by("id")[
+            : size - len(sample)
+        ]
+    return sample
+
+
+def sample_proxies(proxies: QuerySet[Proxy], size: int) -> list[Proxy]:
+    """Returns up to `size` random proxies of the queryset, drawn in the db
+    Up to SAMPLE_SHUFFLE_MAX candidates are shuffled by the database. More
+    are sampled by walking the primary key index from random pivots between
+    their lowest and highest id, SAMPLE_SLICE proxies from each, so only the
+    sample reaches Python however many candidates there are. Spread over
+    several pivots, the sample is not made of a single scrape batch;
+    proxies right after a gap in the ids are still likelier to start one.
+    Args:
+        proxies[QuerySet]: <Proxy> queryset to sample from
+        size[int]: number of proxies to draw at most
+    Returns:
+        list[Proxy]
+    """
+    bounds = proxies.aggregate(
+        low=Min("id"), high=Max("id"), count=Count("id")
+    )
+    if bounds["low"] is None or size < 1:
+        return []
+    if bounds["count"] <= SAMPLE_SHUFFLE_MAX:
+        return list(proxies.order_by("?")[:size])
+    sample = {}
+    for _ in range(math.ceil(size / SAMPLE_SLICE)):
+        pivot = random.randint(bounds["low"], bounds["high"])
+        for proxy in _slice(proxies, pivot, min(SAMPLE_SLICE, size)):
+            sample.setdefault(proxy.pk, proxy)
+    if len(sample) < size:  # slices overlapped, or there are fewer proxies
+        sample.update(
+            (proxy.pk, proxy)
+            for proxy in proxies.exclude(id__in=list(sample)).order_by("id")[
+                : size - len(sample)
+            ]
+        )
+    return list(sample.values())[:size]
+
+
+def get_first_working(
+    proxies: list[Proxy], test_urls: list or tuple = None, target: str = None
+) -> tuple[typing.Optional[Proxy], typing.Optional[dict]]:
+    """Tests the proxies PROXY_TEST_PARALLEL at a time, in the given order
+    Returns as soon as one works, the tests in flight finish in the
+    background, their verdicts cached for the target all the same. Tests
+    run on threads shared by all requests, PROXY_TEST_WORKERS at most.
+    Args:
+        proxies[list]: <Proxy> objects to test
+        test_urls[tuple|list]: URLs to test them against, see `test_ip_port`
+        target[str]: `scraper.verdicts` target to cache the verdicts for
+    Returns:
+        tuple: the first working <Proxy> and its details, or (None, None)
+    """
+
+    def test(proxy: Proxy) -> tuple[bool, dict]:
+        kw = {
+            "ip": proxy.ip,
+            "port": proxy.port,
+            "protocol": proxy.protocol,
+            "timeout": get_timeouts(proxy),
+        }
+        if test_urls:
+            kw.update({"test_urls": test_urls})
+        status, p_dict = test_ip_port(**kw)
+        if target:
+            verdicts.record(target, proxy.pk, status)
+        return status, p_dict
+
+    pending, running = iter(proxies), {}
+    for proxy in itertools.islice(pending, settings.PROXY_TEST_PARALLEL):
+        running[_tests.submit(test, proxy)] = proxy
+    while running:
+        done, _ = concurrent.futures.wait(
+            running, return_when=concurrent.futures.FIRST_COMPLETED
+        )
+        for future in done:
+            proxy = running.pop(future)
+            status, p_dict = future.result()
+            if status:
+                return proxy, p_dict
+        for proxy in itertools.islice(pending, len(done)):  # refill
+            running[_tests.submit(test, proxy)] = proxy
+    return None, None
+
+
+def get_candidates(**kwargs) -> QuerySet[Proxy]:
+    """Returns the anonymous and elite proxies without a failure streak
+    Args:
+        kwargs[dict]: extra filter to pass while retrieving proxies
+    Returns:
+        QuerySet[Proxy]
+    """
+    return get_proxies(
+        anonymity__in=[Anonymity.ANONYMOUS[0], Anonymity.ELITE[0]],
+        is_dead=False,
+        fail_streak=0,  # skip suspects
+        **kwargs,
+    )
+
+
+def get_known_working(
+    candidates: QuerySet[Proxy], target: str
+) -> typing.Optional[Proxy]:
+    """Returns a random candidate known to work for the target, if any
+    The higher scored the likelier, see `scraper.verdicts`.
+    """
+    working = list(candidates.filter(id__in=verdicts.get_working(target)))
+    if not working:
+        return None
+    return weighted_choice(working, [p.score for p in working])
+
+
+def get_sample(
+    candidates: QuerySet[Proxy], tried: set, target: str = None
+) -> typing.Optional[list[Proxy]]:
+    """Returns a random sample of the candidates left to test
+    Those known not to work for the target are left out, the others come
+    in a random order weighted by their score.
+    Args:
+        candidates[QuerySet]: <Proxy> queryset, see `get_candidates`
+        tried[set]: ids of the proxies sampled before, updated
+        target[str]: `scraper.verdicts` target of the test
+    Returns:
+        list[Proxy]: None if no candidate is left
+    """
+    proxies = sample_proxies(
+        candidates.exclude(id__in=tried), settings.PROXY_SAMPLE_SIZE
+    )
+    if not proxies:
+        return None
+    tried.update(p.pk for p in proxies)
+    if target:
+        failed = verdicts.get_failed(target, [p.pk for p in proxies])
+        proxies = [p for p in proxies if p.pk not in failed]
+    # the higher scored the likelier to be tried first
+    return weighted_shuffle(proxies, [p.score for p in proxies])
+
+
 def get_random_working_proxy(
     output: str = "object", test_urls: list or tuple = None, **kwargs
 ) -> typing.Union[Proxy, dict, None]:
     """Returns a random working proxy in the form of object or dictionary
+    Tries up to PROXY_SAMPLE_ATTEMPTS samples of PROXY_SAMPLE_SIZE random
+    candidates, see `get_sample`. Given test_urls, proxies known to work
+    for them are returned without a test, see `scraper.verdicts`.
     Args:
         output[str]: Return type; <Proxy> object or values dictionary
         test_url[str]: URL to check the proxy against
@@ -101,46 +300,124 @@ def get_random_working_proxy(
     Returns:
         <Proxy> object | values dictionary
     """
-    proxies = list(
-        get_proxies(
-            anonymity__in=[Anonymity.ANONYMOUS[0], Anonymity.ELITE[0]],
-            **kwargs,
+    candidates = get_candidates(**kwargs)
+    target = verdicts.get_target(test_urls) if test_urls else None
+    proxy = p_dict = None
+    if target:
+        proxy = get_known_working(candidates, target)
+        if proxy:
+            p_dict = {k: getattr(proxy, k) for k in ("ip", "port", "protocol")}
+
+    tried = set()
+    for _ in range(settings.PROXY_SAMPLE_ATTEMPTS):
+        if proxy:
+            break
+        proxies = get_sample(candidates, tried, target)
+        if proxies is None:
+            break
+        proxy, p_dict = get_first_working(proxies, test_urls, target)
+
+    if not proxy:
+        return None  # no working proxies fallback
+    return p_dict if "dict" in output else proxy
+
+
+class BoundedAdapter(HTTPAdapter):
+    """<HTTPAdapter> keeping at most HTTP_POOL_CONNECTIONS proxies connected
+    The least recently used proxy's connections are closed to make room,
+    where <HTTPAdapter> keeps those of every proxy it was ever asked for.
+    """
+
+    def proxy_manager_for(self, proxy: str, **proxy_kwargs):
+        if proxy in self.proxy_manager:  # most recently used last
+            self.proxy_manager[proxy] = self.proxy_manager.pop(proxy)
+        elif len(self.proxy_manager) >= HTTP_POOL_CONNECTIONS:
+            oldest = next(iter(self.proxy_manager))
+            self.proxy_manager.pop(oldest).clear()
+        return super().proxy_manager_for(proxy, **proxy_kwargs)
+
+
+def get_session(cached: bool = False) -> requests.Session:
+    """Returns this thread's long-lived session, pooling connections
+    Connections to hosts and through proxies are kept alive between
+    requests, sparing the TCP and TLS handshakes of every later request.
+    Args:
+        cached: a session caching responses, see `get_page_source`
+    Returns:
+        requests.Session: shared by every call from the current thread
+    """
+    name = "cached" if cached else "session"
+    session = getattr(_sessions, name, None)
+    if session is None:
+        # the original class, even while requests_cache patches `Session`
+        session = (
+            requests_cache.CachedSession() if cached else OriginalSession()
         )
+        adapter = BoundedAdapter(
+            pool_connections=HTTP_POOL_CONNECTIONS,
+            pool_maxsize=HTTP_POOL_MAXSIZE,
+        )
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        setattr(_sessions, name, session)
+    return session
+
+
+def get_timeouts(proxy: Proxy = None) -> tuple[float, float]:
+    """(connect, read) timeouts of a request through the <Proxy>, if any"""
+    if proxy is None:
+        return timeouts({})  # the ceilings
+    return timeouts(
+        {
+            "connect_p95": proxy.connect_p95,
+            "latency_p95": proxy.latency_p95,
+            "fail_streak": proxy.fail_streak,
+        }
     )
-    if not proxies:
-        return None
 
-    random.shuffle(proxies)
-    for proxy in proxies:
-        kw = {"ip": proxy.ip, "port": proxy.port, "protocol": proxy.protocol}
-        if test_urls:
-            kw.update({"test_urls": test_urls})
-        status, p_dict = test_ip_port(**kw)
-        if status:
-            if "dict" in output:
-                return p_dict
-            else:
-                return proxy
-    return None  # no working proxies fallback
+
+def get_proxy_params(ip: str, port: typing.Union[int, str]) -> dict:
+    """Returns the `proxies` parameter of requests for an HTTP(S) proxy
+    Both http and https URLs go through the proxy, the latter tunnelled
+    with CONNECT.
+    """
+    url = f"http://{ip}:{port}"
+    return {"http": url, "https": url}
 
 
 def get_page_source(
-    url: str, timeout: int = 30, retry: int = 3, use_proxy: bool = False
+    url: str,
+    timeout: typing.Union[float, tuple] = None,
+    retry: int = 3,
+    use_proxy: bool = False,
+    cache: int = None,
 ) -> bytes or None:
-    """Returns non JS rendered page source code"""
-    proxy_param = None
-    if use_proxy:
-        proxy = get_random_working_proxy()
+    """Returns non JS rendered page source code
+    Args:
+        url: a full path to the page, including protocol://domain/path/
+        timeout: seconds to wait before timing out the request, or a
+            (connect, read) tuple; default=`timeouts` of the proxy, if any
+        retry: times to retry a failed request
+        use_proxy: request through a random working proxy
+        cache: seconds to keep the response cached, not cached if None
+    """
+    proxy_param, proxy_timeout = None, None
+    if use_proxy:  # the session speaks HTTP(S) proxies only
+        proxy = get_random_working_proxy(protocol__in=HTTP_PROTOCOLS)
         if proxy:
-            proxy_param = {
-                proxy.protocol.lower(): f"http://{proxy.ip}:{proxy.port}"
-            }
+            proxy_param = get_proxy_params(proxy.ip, proxy.port)
+            proxy_timeout = get_timeouts(proxy)
 
     content = None
     try:  # catch requests exceptions
         headers = {"User-Agent": random.choice(USER_AGENTS)}
-        res: Response = requests.get(
-            url, headers=headers, timeout=timeout, proxies=proxy_param
+        kwargs = {"expire_after": timedelta(seconds=cache)} if cache else {}
+        res: Response = get_session(cached=bool(cache)).get(
+            url,
+            headers=headers,
+            timeout=timeout or proxy_timeout or get_timeouts(),
+            proxies=proxy_param,
+            **kwargs,
         )
         if res.ok:  # 2xx/3xx status
             content = res.content
@@ -153,9 +430,9 @@ def get_page_source(
         logger.info(f"<{url}> Failed to get page source")
 
     if not content and retry:
-        return get_page_source(url, timeout, retry - 1)
+        return get_page_source(url, timeout, retry - 1, cache=cache)
     if not content and not retry and use_proxy:
-        return get_page_source(url, timeout, 0, False)  # dont use proxy
+        return get_page_source(url, timeout, 0, False, cache)  # dont use proxy
     return content
 
 
@@ -238,13 +515,10 @@ def get_content(
     if page and has_js is None:
         has_js = page.has_js
 
-    # cache page for 5 minutes (default)
-    requests_cache.install_cache(expire_after=timedelta(seconds=cache))
-
     if has_js:  # js rendered via selenium
         page_source = get_js_page_source(url)
     else:  # non js html page source
-        page_source = get_page_source(url)
+        page_source = get_page_source(url, cache=cache)  # 5 minutes default
 
     logger.info("Returning page source.")
     logger.debug(f"Page source: {page_source}")
@@ -283,21 +557,28 @@ def test_ip_port(
     ip: str = None,
     port: typing.Union[int, str] = None,
     protocol: str = "http",
-    test_urls: typing.Union[tuple, list] = tuple(
-        random.choices(TEST_URLS, k=3)
-    ),
-    timeout: int = 30,
+    test_urls: typing.Union[tuple, list] = None,
+    timeout: typing.Union[float, tuple] = None,
+    parallel: bool = True,
 ) -> tuple[bool, dict]:
     """Tests for a working proxy
+    Returns as soon as the `quorum` verdict is certain, remaining requests
+    are cancelled or left to time out in the background. SOCKS proxies are
+    handed to the asyncio engine, see `scraper.probe.probe`; called from a
+    coroutine, the probe is scheduled on its loop and returned to await.
     Args:
         proxy [dict]: Dictionary containing ip, port, protocol, etc
         ip [str]: If proxy[dict] not given, must provide the ip address
         port [str|int]: Must provide a port paired with ip address
         protocol [str]: Proxy protocol; default=http
-        test_urls[tuple|list]: URLs to test the proxy against
-        timeout [int]: Connection timeout in seconds; default=30
+        test_urls[tuple|list]: URLs to test the proxy against; drawn from
+            the `scraper.targets` pool, which is told how they fared
+        timeout [float|tuple]: Seconds allowed to connect and to respond,
+            or a (connect, read) tuple; default=`timeouts` of the proxy
+        parallel [bool]: Request all test_urls at once; default=True
     Returns:
-        tuple[bool, dict]: Status of Proxy, Proxy details
+        tuple[bool, dict]: Status of Proxy, Proxy details, or a task
+            resulting in them for SOCKS proxies tested from a coroutine
     Raises:
         ValueError: if proxy[dict] or ip:port not provided
     """
@@ -311,54 +592,101 @@ def test_ip_port(
         proxy = {"ip": ip, "port": port, "protocol": protocol}
 
     logger.debug(f"Testing proxy ip: {ip}, port: {port}, protocol: {protocol}")
-    params = {protocol.lower(): f"http://{ip}:{port}"}
-
-    count = 0
-    for url in test_urls:
-        try:  # test the proxy
-            with requests_cache.disabled():
-                headers = {"User-Agent": random.choice(USER_AGENTS)}
-                res = requests.get(
-                    url, headers=headers, timeout=timeout, proxies=params
-                )
-            if res.ok:
-                count += 1
+    test_urls = test_urls or targets.get_test_urls()
+    timeout = timeout or timeouts(proxy)
+    if protocol.upper() in SOCKS_PROTOCOLS:  # spoken natively by the engine
+        coro = probe(proxy, test_urls, timeout)
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:  # no loop running in this thread
+            return asyncio.run(coro)
+        # called from a coroutine, whose loop waiting here would block
+        return asyncio.ensure_future(coro)
+    params = get_proxy_params(ip, port)
+
+    def fetch(url: str) -> tuple[str, bool, int]:
+        try:  # test the proxy, sessions are not shared between threads
+            headers = {"User-Agent": random.choice(USER_AGENTS)}
+            res = get_session().get(
+                url, headers=headers, timeout=timeout, proxies=params
+            )
+            return url, res.ok, round(res.elapsed.total_seconds() * 1000)
         except Exception as e:
             logger.error(f"<{params}> {e}")
+            return url, False, 0
+
+    passed = failed = 0
+    verdict = quorum(passed, failed, len(test_urls))
+    finished, futures = [], []
+    try:
+        if parallel and len(test_urls) > 1:
+            futures = [_fetches.submit(fetch, url) for url in test_urls]
+            results = (
+                f.result() for f in concurrent.futures.as_completed(futures)
+            )
+        else:
+            results = (fetch(url) for url in test_urls)
+        for result in results:
+            finished.append(result)
+            if result[1]:
+                passed += 1
+            else:
+                failed += 1
+            verdict = quorum(passed, failed, len(test_urls))
+            if verdict is not None:
+                break
+    finally:  # verdict is certain, skip the requests not yet started
+        for future in futures:
+            future.cancel()
 
-    if count >= len(test_urls) - 1:
-        return True, proxy
-    else:
-        return False, proxy
+    if verdict:
+        targets.record(finished)
+    return bool(verdict), proxy
+
+
+def get_key(proxy: dict) -> tuple[str, int]:
+    """Returns the (ip, port) a proxy in `dict` form is unique by"""
+    return proxy["ip"], int(proxy["port"])
 
 
-def get_tested(proxies: list[dict], timeout: int = 30) -> list[dict]:
+def get_existing(keys: typing.Iterable[tuple[str, int]]) -> set[tuple]:
+    """Returns the (ip, port) of the given ones already in the database
+    A single query, whatever the number of proxies.
+    """
+    keys = {(ip, int(port)) for ip, port in keys}
+    if not keys:
+        return set()
+    ips = {ip for ip, _ in keys}
+    return keys & set(
+        Proxy.objects.filter(ip__in=ips).values_list("ip", "port")
+    )
+
+
+def get_tested(
+    proxies: list[dict], timeout: typing.Union[float, tuple] = None
+) -> list[dict]:
     """Test extracted proxies against a TEST_URL
     Args:
         proxies: List of proxies in `dict` form containing `ip` and `port`, etc
-        timeout: seconds to wait before timing out the testing request
+        timeout: seconds to wait before timing out the testing request, or a
+            (connect, read) tuple; default=the `timeouts` ceilings
     Returns:
         list: A list of tested proxies
     """
     logger.info("Commenced proxy testing...")
     tested = []  # list of tested proxies
 
-    with ThreadPoolExecutor() as executor:
-        futures = []
-
-        for p in proxies:
-            if Proxy.objects.filter(ip=p["ip"], port=p["port"]).exists():
-                continue  # skip testing existing proxy, will bulk test in bg
-            kwargs = {"proxy": p, "timeout": timeout}
-            futures.append(executor.submit(test_ip_port, **kwargs))
+    # skip testing existing proxies, will bulk test in bg
+    existing = get_existing(get_key(p) for p in proxies)
+    untested = [p for p in proxies if get_key(p) not in existing]
 
-        for future in concurrent.futures.as_completed(futures):
-            try:
-                status, proxy = future.result()
-                if status:  # add tested proxy to list if connectable
-                    tested.append(proxy)
-            except Exception as e:
-                logger.error(e)
+    for status, proxy in probe_proxies(
+        untested,
+        timeout=timeout,
+        detect_protocol=settings.PROXY_DETECT_PROTOCOL,
+    ):
+        if status:  # add tested proxy to list if connectable
+            tested.append(proxy)
 
     logger.info("Proxy testing complete")
     logger.debug(f"Tested proxies: {tested}")
@@ -367,32 +695,50 @@ def get_tested(proxies: list[dict], timeout: int = 30) -> list[dict]:
 
 def save_to_db(page: Page, proxies: list[dict]) -> list[Proxy]:
     """Save a list of tested proxies to the database
+    Proxies already in the database are left as they are, the others are
+    created and linked to the page in bulk, in four queries whatever the
+    number of proxies. Invalid proxies are skipped, so a single bad row
+    cannot fail the whole batch.
     Args:
         page: <Page> object
         proxies: List of tested proxies in `dict`
     Returns:
-        bool: status of the operation
+        list: the saved <Proxy> objects
     """
     logger.info("Commenced saving to database...")
-    saved = []  # list of saved proxies to be returned
-
+    now = timezone.now()
+    new = {}  # distinct proxies by (ip, port)
     for p in proxies:
         try:
-            obj, _ = Proxy.objects.get_or_create(
+            obj = Proxy(
                 ip=p["ip"],  # ip address
-                port=p["port"],  # port
+                port=int(p["port"]),  # port
                 country=p["country"],  # country code
                 anonymity=p["anonymity"],
                 protocol=p["protocol"],
-                checked_at=timezone.now(),
+                checked_at=now,
             )
-            obj.found_in.add(page)  # add the m2m field
-            obj.save()  # finally save the proxy
-            saved.append(obj)
-            logger.debug(f"{obj} saved in database")
+            obj.full_clean(validate_unique=False)  # no queries
+            new.setdefault(get_key(p), obj)
         except Exception as e:
             logger.error(e)
-            logger.debug(f"Failed to save tested proxy {p['ip']}:{p['port']}")
+            logger.debug(f"Failed to save tested proxy {p.get('ip')}")
+    for key in get_existing(new):
+        del new[key]
+    if not new:
+        return []
+
+    # ignoring conflicts with proxies saved since, ids are read back after
+    Proxy.objects.bulk_create(new.values(), ignore_conflicts=True)
+    saved = [
+        obj
+        for obj in Proxy.objects.filter(ip__in={ip for ip, _ in new})
+        if (obj.ip, obj.port) in new
+    ]
+    Proxy.found_in.through.objects.bulk_create(
+        [Proxy.found_in.through(proxy=obj, page=page) for obj in saved],
+        ignore_conflicts=True,
+    )
 
     logger.info("Saved to database.")
     logger.debug(f"Proxies: {saved}")
@@ -0,0 +1,82 @@
+"""
+Cached outcomes of testing proxies against the caller's own targets.
+
+A verdict tells whether a proxy worked for a target, the set of domains
+of the test URLs a client asked for, and is kept for PROXY_VERDICT_TTL
+seconds if it did, PROXY_VERDICT_FAILED_TTL if it did not. Proxies that
+worked are also indexed by target, so a client asking again is answered
+without probing. Verdicts live in the default cache, shared by all
+processes when a shared backend is configured.
+"""
+import hashlib
+import time
+import typing
+from logging import getLogger
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = getLogger(__name__)
+
+VERDICT_KEY = "scraper:verdict:{target}:{proxy_id}"
+WORKING_KEY = "scraper:working:{target}"
+
+
+def get_target(test_urls: typing.Iterable[str]) -> str:
+    """Target of the test URLs, their sorted distinct domains
+    Raises:
+        ValueError: if a test URL has no host, ie. is not absolute
+    """
+    netlocs = set()
+    for url in test_urls:
+        parts = urlsplit(url)
+        if not parts.hostname:
+            raise ValueError(f"Test URL without a host: {url!r}")
+        netlocs.add(parts.netloc.lower())
+    return ",".join(sorted(netlocs))
+
+
+def _key(template: str, target: str, **kwargs: typing.Any) -> str:
+    """Cache key of the target, hashed to a safe and bounded length"""
+    digest = hashlib.md5(target.encode()).hexdigest()
+    return template.format(target=digest, **kwargs)
+
+
+def get_failed(target: str, proxy_ids: typing.Iterable[int]) -> set[int]:
+    """Returns the ids of the proxies known not to work for the target"""
+    keys = {_key(VERDICT_KEY, target, proxy_id=pk): pk for pk in proxy_ids}
+    verdicts = cache.get_many(keys)
+    return {keys[key] for key, ok in verdicts.items() if not ok}
+
+
+def get_working(target: str) -> list[int]:
+    """Returns the ids of the proxies known to work for the target"""
+    now = time.time()
+    working = cache.get(_key(WORKING_KEY, target)) or {}
+    return [pk for pk, expires in working.items() if expires > now]
+
+
+def record(target: str, proxy_id: int, ok: bool) -> None:
+    """Caches whether a proxy worked for the target
+    Args:
+        target: domains the proxy was tested against, see `get_target`
+        proxy_id: id of the <Proxy>
+        ok: whether it worked
+    """
+    ttl = (
+        settings.PROXY_VERDICT_TTL if ok else settings.PROXY_VERDICT_FAILED_TTL
+    )
+    cache.set(_key(VERDICT_KEY, target, proxy_id=proxy_id), ok, ttl)
+
+    # index of working proxies, last writer wins, a lost entry costs a probe
+    key, now = _key(WORKING_KEY, target), time.time()
+    working = {
+        pk: expires
+        for pk, expires in (cache.get(key) or {}).items()
+        if expires > now and pk != proxy_id
+    }
+    if ok:
+        working[proxy_id] = now + ttl
+    cache.set(key, working, settings.PROXY_VERDICT_TTL)
+    logger.debug(f"<Proxy: {proxy_id}> {'Works' if ok else 'Fails'} {target}")
@@ -1,15 +1,33 @@
+import typing
+import uuid
 from http import HTTPStatus
 
-from rest_framework import views, viewsets
-from rest_framework.exceptions import ParseError
+from django.conf import settings
+from django.http import HttpResponseNotModified, StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
+from django.utils.text import compress_sequence
+from rest_framework import permissions, views, viewsets
+from rest_framework.exceptions import NotFound, ParseError
 from rest_framework.request import Request
 from rest_framework.response import Response
 
-from scraper import models, serializers, tasks
+from base.cache import CachedResponseMixin
+from base.negotiation import FirstRendererNegotiation
+from base.pagination import KeysetPagination
+from scraper import (
+    export,
+    leases,
+    models,
+    pool,
+    serializers,
+    tasks,
+    verdicts,
+)
 from scraper.utils import get_random_working_proxy
 
 
-class WebsiteViewSet(viewsets.ModelViewSet):
+class WebsiteViewSet(CachedResponseMixin, viewsets.ModelViewSet):
     queryset = models.Website.objects.all()
     serializer_class = serializers.WebsiteSerializer
     filterset_fields = ("is_active",)
@@ -17,20 +35,134 @@ class WebsiteViewSet(viewsets.ModelViewSet):
     ordering_fields = ("name", "code", "id")
 
 
-class PageViewSet(viewsets.ModelViewSet):
-    queryset = models.Page.objects.all()
+class PageViewSet(CachedResponseMixin, viewsets.ModelViewSet):
+    queryset = models.Page.objects.select_related("site")
     serializer_class = serializers.PageSerializer
     filterset_fields = ("is_active", "has_js")
     search_field = ("site__name", "site__code", "path")
     ordering_fields = ("site", "id")
 
 
-class ProxyViewSet(viewsets.ModelViewSet):
+class ProxyViewSet(CachedResponseMixin, viewsets.ModelViewSet):
     queryset = models.Proxy.objects.all()
     serializer_class = serializers.ProxySerializer
-    filterset_fields = ("is_active", "is_dead", "anonymity", "protocol")
+    filterset_fields = {
+        "is_active": ["exact"],
+        "is_dead": ["exact"],
+        "anonymity": ["exact"],
+        "protocol": ["exact"],
+        "latency_p50": ["lte"],
+        "latency_p95": ["lte"],  # ie. ?latency_p95__lte=500
+        "score": ["gte"],
+    }
     search_field = ("ip", "port", "country")
-    ordering_fields = ("id", "ip", "port", "country")
+    ordering_fields = (
+        "id",
+        "ip",
+        "port",
+        "country",
+        "latency_ms",
+        "latency_p50",
+        "latency_p95",
+        "score",
+    )
+    # default of OrderingFilter, keys the cursor; the others are paged
+    ordering = ("-id",)
+    pagination_class = KeysetPagination
+
+
+class ScrapeViewSet(viewsets.ReadOnlyModelViewSet):
+    queryset = models.Scrape.objects.prefetch_related("sites")
+    serializer_class = serializers.ScrapeSerializer
+    filterset_fields = ("is_success",)
+    ordering_fields = ("id",)
+    ordering = ("-id",)
+    pagination_class = KeysetPagination
+
+
+class CheckViewSet(viewsets.ReadOnlyModelViewSet):
+    queryset = models.Check.objects.all()
+    serializer_class = serializers.CheckSerializer
+    filterset_fields = ("is_success",)
+    ordering_fields = ("id",)
+    ordering = ("-id",)
+    pagination_class = KeysetPagination
+
+
+def get_filters(params: dict) -> dict:
+    """Proxy filters from the country, protocol, anonymity and max_latency
+    parameters of a request, see `scraper.pool.get_matching`
+    """
+    filters = {}
+    for k in ("country", "protocol", "anonymity"):
+        if not params.get(k):
+            continue
+        if not isinstance(params[k], str):  # ie. a number in a JSON body
+            raise ParseError(f"{k} must be a string")
+        filters[k] = params[k].upper()
+    if params.get("max_latency"):
+        try:
+            filters["max_latency"] = int(params["max_latency"])
+        except (TypeError, ValueError):
+            raise ParseError("max_latency must be an integer, in ms")
+    return filters
+
+
+def get_count(params: dict) -> int:
+    """Number of proxies from the count parameter of a batch request"""
+    try:
+        count = int(params["count"])
+    except ValueError:
+        count = 0
+    if not 0 < count <= settings.PROXY_BATCH_MAX:
+        raise ParseError(f"count must be from 1 to {settings.PROXY_BATCH_MAX}")
+    return count
+
+
+def accepts_encoding(header: str, encoding: str) -> bool:
+    """Whether an Accept-Encoding header accepts the content encoding
+    Weighed by the q values, q=0 refuses it, as does `*;q=0` unless it is
+    named on its own.
+    """
+    qualities = {}
+    for item in header.split(","):
+        name, *params = (part.strip() for part in item.split(";"))
+        q = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if name:
+            qualities[name.lower()] = q
+    return qualities.get(encoding, qualities.get("*", 0.0)) > 0
+
+
+def get_test_urls(params: dict) -> list[str]:
+    """Test URLs of a request to verify a proxy against, see `verdicts`"""
+    test_urls = params.getlist("test_urls")
+    if not test_urls:
+        raise ParseError("Must provide test_urls for proxy check")
+    try:
+        verdicts.get_target(test_urls)
+    except ValueError as e:
+        raise ParseError(str(e))
+    return test_urls
+
+
+def get_ttl(params: dict) -> typing.Optional[int]:
+    """Lease duration in seconds from the ttl parameter of a request"""
+    if not params.get("ttl"):
+        return None
+    try:
+        ttl = int(params["ttl"])
+    except (TypeError, ValueError):
+        ttl = 0
+    if ttl <= 0:
+        raise ParseError("ttl must be a positive integer, in seconds")
+    return ttl
 
 
 class ScrapeSitesAPI(views.APIView):
@@ -46,10 +178,23 @@ class CheckProxiesAPI(views.APIView):
 
 
 class GetProxyAPI(views.APIView):
+    fields = ("ip", "port", "protocol")
+    batch_fields = (*fields, "country", "anonymity", "latency_p95")
+
     def get_proxy(
-        self, output: str = "dict", test_urls: list or tuple = None
+        self,
+        output: str = "dict",
+        test_urls: list or tuple = None,
+        **filters: dict,
     ) -> Response:
-        result = get_random_working_proxy(output="dict", test_urls=test_urls)
+        if test_urls:  # verified against the caller's own targets
+            result = get_random_working_proxy(
+                output="dict", test_urls=test_urls
+            )
+        else:  # verified by the checker, never probed on the request path
+            result = pool.pick(**filters)
+            if result:
+                result = {k: result[k] for k in self.fields}
         if result:
             return Response(
                 {"result": result, "status": "SUCCESS"}, status=HTTPStatus.OK
@@ -59,13 +204,120 @@ class GetProxyAPI(views.APIView):
                 {"status": "NO PROXY FOUND"}, status=HTTPStatus.NO_CONTENT
             )  # 204 No content
 
+    def get_proxies(self, count: int, **filters: dict) -> Response:
+        """Serves up to `count` distinct proxies from the warm pool"""
+        results = [
+            {k: p[k] for k in self.batch_fields}
+            for p in pool.pick_many(count, **filters)
+        ]
+        if results:
+            return Response(
+                {
+                    "results": results,
+                    "count": len(results),
+                    "status": "SUCCESS",
+                },
+                status=HTTPStatus.OK,
+            )
+        return Response(
+            {"status": "NO PROXY FOUND"}, status=HTTPStatus.NO_CONTENT
+        )
+
     def get(self, request: Request):
-        return self.get_proxy()
+        filters = get_filters(request.query_params)
+        if "count" not in request.query_params:
+            return self.get_proxy(**filters)
+        return self.get_proxies(get_count(request.query_params), **filters)
 
     def post(self, request: Request):
-        test_urls = request.POST.get("test_urls", None)
-        if not test_urls:
-            raise ParseError("Must provide test_urls for proxy check")
-        if isinstance(test_urls, str):
-            test_urls = (test_urls,)
-        return self.get_proxy(test_urls=test_urls)
+        return self.get_proxy(test_urls=get_test_urls(request.POST))
+
+
+class LeaseProxyAPI(views.APIView):
+    """Leases a proxy exclusively, until released or `ttl` seconds passed"""
+
+    def post(self, request: Request):
+        result = leases.lease(
+            get_ttl(request.data), **get_filters(request.data)
+        )
+        if result:
+            del result["id"]
+            return Response(
+                {"result": result, "status": "SUCCESS"}, status=HTTPStatus.OK
+            )  # 200 OK
+        return Response(
+            {"status": "NO PROXY FOUND"}, status=HTTPStatus.NO_CONTENT
+        )  # 204 No content
+
+
+class LeaseDetailAPI(views.APIView):
+    """Renews or releases a proxy lease by its token"""
+
+    def put(self, request: Request, token: uuid.UUID):
+        leased_until = leases.renew(token, get_ttl(request.data))
+        if not leased_until:
+            raise NotFound("No such lease, or it has expired")
+        return Response(
+            {
+                "result": {"lease": token, "leased_until": leased_until},
+                "status": "SUCCESS",
+            },
+            status=HTTPStatus.OK,
+        )
+
+    def delete(self, request: Request, token: uuid.UUID):
+        if not leases.release(token):
+            raise NotFound("No such lease")
+        return Response(status=HTTPStatus.NO_CONTENT)
+
+
+class ExportProxiesAPI(views.APIView):
+    """Streams the live proxies as ip:port lines, CSV or JSON lines
+    Takes the same filters as GetProxyAPI, gzipped if the client accepts
+    it, 304 Not Modified if the list has not changed since its ETag.
+    """
+
+    content_negotiation_class = FirstRendererNegotiation
+
+    def get(self, request: Request, ext: str):
+        if ext not in export.FORMATS:
+            raise NotFound(
+                f"Format must be one of {', '.join(export.FORMATS)}"
+            )
+        filters = get_filters(request.query_params)
+        gzipped = accepts_encoding(
+            request.headers.get("Accept-Encoding", ""), "gzip"
+        )
+        etag = export.get_etag(ext, sorted(filters.items()), gzipped)
+        if etag in parse_etags(request.headers.get("If-None-Match", "")):
+            response = HttpResponseNotModified()
+            response["ETag"] = etag
+            return response
+
+        content = export.export(export.get_export_proxies(**filters), ext)
+        if gzipped:
+            content = compress_sequence(chunk.encode() for chunk in content)
+        response = StreamingHttpResponse(
+            content, content_type=export.FORMATS[ext][2]
+        )
+        if gzipped:
+            response["Content-Encoding"] = "gzip"
+        response["ETag"] = etag
+        response["Content-Disposition"] = f'inline; filename="proxies.{ext}"'
+        patch_vary_headers(response, ("Accept-Encoding",))
+        return response
+
+
+class JudgeAPI(views.APIView):
+    """Echoes the client ip and request headers for proxy judging"""
+
+    authentication_classes = ()  # proxies under test cannot authenticate
+    permission_classes = (permissions.AllowAny,)
+
+    def get(self, request: Request):
+        return Response(
+            {
+                "ip": request.META.get("REMOTE_ADDR"),
+                "headers": dict(request.headers),
+            }
+        )
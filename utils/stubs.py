@@ -0,0 +1,151 @@
+import http.client
+import socket
+import struct
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from socketserver import StreamRequestHandler
+from urllib.parse import urlsplit
+
+
+def relay(handler: StreamRequestHandler, target: tuple) -> None:
+    """Relays one request read from the handler to target, and the reply"""
+    with socket.create_connection(target, timeout=10) as upstream:
+        request = b"".join(iter(handler.rfile.readline, b"\r\n"))
+        upstream.sendall(request + b"\r\n")
+        while chunk := upstream.recv(4096):
+            handler.wfile.write(chunk)
+
+
+class StubProxyHandler(BaseHTTPRequestHandler):
+    """Answers every absolute-form proxy request with a canned response"""
+
+    protocol_version = "HTTP/1.1"  # keep-alive, unless asked to close
+    disable_nagle_algorithm = True  # headers and body are written apart
+
+    def do_GET(self):
+        time.sleep(self.server.delay)  # simulated upstream latency
+        body = b"ok"
+        self.send_response(self.server.status)
+        self.send_header("Content-Type", "text/plain")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_CONNECT(self):
+        host, _, port = self.path.rpartition(":")
+        self.send_response(200, "Connection established")
+        self.end_headers()
+        relay(self, (host, int(port)))
+        self.close_connection = True
+
+    def log_message(self, format, *args):
+        pass  # keep test and benchmark output quiet
+
+
+class ForwardingProxyHandler(StubProxyHandler):
+    """Relays absolute-form requests upstream, adding the server's headers"""
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        conn = http.client.HTTPConnection(url.hostname, url.port, timeout=10)
+        headers = {
+            k: v
+            for k, v in self.headers.items()
+            if k.lower() not in ("connection", "proxy-connection")
+        }
+        headers.update(self.server.headers)  # ie. Via or X-Forwarded-For
+        conn.request("GET", url.path or "/", headers=headers)
+        res = conn.getresponse()
+        body = res.read()
+        conn.close()
+
+        self.send_response(res.status)
+        self.send_header("Content-Type", res.getheader("Content-Type", ""))
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class SocksProxyHandler(StreamRequestHandler):
+    """Minimal SOCKS5 proxy relaying a single request per connection"""
+
+    def handle(self):
+        target = self.handshake()
+        if target:
+            relay(self, target)
+
+    def handshake(self) -> tuple or None:
+        """Reads the CONNECT request, returns its (host, port) target"""
+        greeting = self.rfile.read(2)
+        if greeting[:1] != b"\x05":
+            return None  # hang up on other protocols
+        self.rfile.read(greeting[1])  # offered authentication methods
+        self.wfile.write(b"\x05\x00")
+        _, _, _, atyp = self.rfile.read(4)
+        if atyp == 1:
+            host = socket.inet_ntoa(self.rfile.read(4))
+        else:
+            host = self.rfile.read(self.rfile.read(1)[0]).decode()
+        (port,) = struct.unpack(">H", self.rfile.read(2))
+        self.wfile.write(b"\x05\x00\x00\x01" + bytes(6))
+        return host, port
+
+
+class Socks4ProxyHandler(SocksProxyHandler):
+    """Minimal SOCKS4a proxy relaying a single request per connection"""
+
+    def handshake(self) -> tuple or None:
+        if self.rfile.read(1) != b"\x04":
+            self.wfile.write(b"\x00\x5b" + bytes(6))  # rejected
+            return None
+        _, port, address = struct.unpack(">BH4s", self.rfile.read(7))
+        self.read_null_terminated()  # user id
+        host = socket.inet_ntoa(address)
+        if host.startswith("0.0.0."):  # SOCKS4a, the name follows
+            host = self.read_null_terminated().decode()
+        self.wfile.write(b"\x00\x5a" + bytes(6))
+        return host, port
+
+    def read_null_terminated(self) -> bytes:
+        return b"".join(iter(lambda: self.rfile.read(1), b"\x00"))
+
+
+class StubProxyServer(ThreadingHTTPServer):
+    """Local stand-in HTTP proxy for tests and benchmarks
+    Usage:
+        with StubProxyServer(delay=0.1) as stub:
+            proxy = {"ip": stub.ip, "port": stub.port, "protocol": "HTTP"}
+    Args:
+        delay: seconds to wait before answering each request
+        status: HTTP status code returned for each request
+        handler: request handler class serving the stub, ie. a SOCKS one
+        headers: headers added to relayed requests, see ForwardingProxyHandler
+    """
+
+    daemon_threads = True
+    request_queue_size = 1024  # benchmarks open many connections at once
+
+    def __init__(
+        self,
+        delay: float = 0,
+        status: int = 200,
+        handler: type = StubProxyHandler,
+        headers: dict = None,
+    ):
+        self.delay = delay
+        self.status = status
+        self.headers = headers or {}
+        super().__init__(("127.0.0.1", 0), handler)
+        self.ip, self.port = self.server_address[:2]
+
+    def handle_error(self, request, client_address):
+        pass  # probes hang up mid-request on purpose
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+        self.server_close()